@@ -3,6 +3,7 @@
 # dependencies = [
 #   "pandas",
 #   "numpy",
+#   "pyarrow",
 #   "apsw"
 # ]
 # ///
@@ -60,19 +61,248 @@
 #     for k,v in cur.execute("SELECT key,value FROM cursorDiskKV WHERE typeof(value) IN ('text','blob') AND value LIKE ? LIMIT 5", (f'%{kw}%',)):
 #         s=v.decode('utf-8','ignore') if isinstance(v,(bytes,bytearray)) else str(v); print(k, s[:160].replace('\n',' '))
 import argparse
+import contextlib
+import functools
+import gzip
+import hashlib
+import io
 import json
+import math
+import os
+import random
 import re
+import shutil
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import time
+import uuid
+import zlib
 from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
 
 import apsw
 
-CURSOR_STORAGE_DIR_PATH = Path(
-    "/Users/giladbarnea/Library/Application Support/Cursor/User/globalStorage/"
-)
+# numpy (and pandas/pyarrow/fastembed) are imported inside the features that use them, so the
+# common keyword/thread paths start with only apsw and the stdlib; --bench-startup guards that.
+if TYPE_CHECKING:
+    import numpy as np
+
+def default_storage_dir() -> Path:
+    """$CURSOR_STORAGE_DIR, else Cursor's globalStorage directory for this platform."""
+    if env := os.environ.get("CURSOR_STORAGE_DIR"):
+        return Path(env).expanduser()
+    if sys.platform == "darwin":
+        return Path.home() / "Library/Application Support/Cursor/User/globalStorage"
+    if sys.platform == "win32":
+        return Path(os.environ.get("APPDATA", Path.home() / "AppData/Roaming")) / "Cursor/User/globalStorage"
+    return Path.home() / ".config/Cursor/User/globalStorage"
+
+
+CURSOR_STORAGE_DIR_PATH = default_storage_dir().expanduser().resolve()
 STATE_SQLITE_PATH = CURSOR_STORAGE_DIR_PATH / "state.sqlite"
 STATE_VSCDB_PATH = CURSOR_STORAGE_DIR_PATH / "state.vscdb"
+CACHE_ROOT_PATH = Path.home() / ".cache/land/cursor-ide"
+CACHE_DIR_PATH = CACHE_ROOT_PATH
+SNAPSHOT_PAGES_PER_STEP = 1024
+# Set by --snapshot: connect() then serves a private copy of each DB instead of the live file.
+use_snapshots = False
+
+
+def file_fingerprint(db_path: Path) -> Dict[str, int]:
+    """Size and mtime of a DB and its WAL; any change means Cursor has written since."""
+    fingerprint: Dict[str, int] = {}
+    for suffix in ("", "-wal"):
+        try:
+            st = os.stat(str(db_path) + suffix)
+        except FileNotFoundError:
+            continue
+        fingerprint[f"size{suffix}"] = st.st_size
+        fingerprint[f"mtime_ns{suffix}"] = st.st_mtime_ns
+    return fingerprint
+
+
+def ensure_snapshot(db_path: Path) -> Path:
+    """Copy `db_path` into CACHE_DIR_PATH with the online backup API, unless the copy is current.
+
+    The backup runs SNAPSHOT_PAGES_PER_STEP pages at a time, yielding between steps so Cursor's
+    writers aren't blocked; SQLite restarts the copy itself if the source changes mid-way.
+    """
+    fingerprint = file_fingerprint(db_path)
+    if not fingerprint:
+        raise FileNotFoundError(db_path)
+    snapshot_path = CACHE_DIR_PATH / db_path.name
+    fingerprint_path = CACHE_DIR_PATH / (db_path.name + ".fingerprint.json")
+    try:
+        if snapshot_path.exists() and json.loads(fingerprint_path.read_text()) == fingerprint:
+            return snapshot_path
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    CACHE_DIR_PATH.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    source = apsw.Connection(str(db_path), flags=apsw.SQLITE_OPEN_READONLY)
+    dest = apsw.Connection(str(tmp_path))
+    try:
+        with dest.backup("main", source, "main") as backup:
+            while not backup.done:
+                try:
+                    backup.step(SNAPSHOT_PAGES_PER_STEP)
+                except apsw.BusyError:
+                    time.sleep(0.05)
+                    continue
+                time.sleep(0)
+    finally:
+        dest.close()
+        source.close()
+    # Publish atomically so a concurrent run never opens a half-written snapshot.
+    os.replace(tmp_path, snapshot_path)
+    fingerprint_path.write_text(json.dumps(fingerprint))
+    return snapshot_path
+
+
+class WarmConnection(apsw.Connection):
+    """A connection kept open by --serve across requests; callers' close() leaves it open."""
+
+    def close(self, force: bool = False) -> None:
+        pass
+
+    def really_close(self) -> None:
+        apsw.Connection.close(self)
+
+
+# Set by --serve: connect() and open_catalog() then hand out WarmConnections kept here,
+# keyed by the file they opened (and, for snapshots, its fingerprint).
+warm_connections: Optional[Dict[str, WarmConnection]] = None
+
+
+def warm_connection(key: str, path: Path, stale_prefix: Optional[str] = None) -> Tuple[apsw.Connection, bool]:
+    """Return (connection, is_new): the warm connection for `key`, opening it on first use.
+
+    Any other warm connection whose key starts with `stale_prefix` is closed first, so a
+    replaced snapshot doesn't keep its predecessor open.
+    """
+    if warm_connections is None:
+        return apsw.Connection(str(path)), True
+    if key in warm_connections:
+        return warm_connections[key], False
+    if stale_prefix:
+        for stale_key in [k for k in warm_connections if k.startswith(stale_prefix)]:
+            warm_connections.pop(stale_key).really_close()
+    conn = WarmConnection(str(path))
+    warm_connections[key] = conn
+    return conn, True
+
+
+def connect(db_path: Path) -> apsw.Connection:
+    """Open one of the Cursor DBs, or its up-to-date snapshot when --snapshot is on."""
+    if use_snapshots:
+        snapshot_path = ensure_snapshot(db_path)
+        fingerprint = json.dumps(file_fingerprint(db_path), sort_keys=True)
+        conn, is_new = warm_connection(f"snapshot:{snapshot_path}:{fingerprint}", snapshot_path, f"snapshot:{snapshot_path}:")
+    else:
+        conn, is_new = warm_connection(f"live:{db_path}", db_path)
+    if not is_new:
+        return conn
+    if not use_snapshots:
+        # Wait out Cursor's short write transactions instead of failing the scan.
+        conn.set_busy_timeout(2000)
+    conn.create_scalar_function("regexp", sql_regexp, 2, deterministic=True)
+    conn.create_scalar_function("regexp_count", sql_regexp_count, 2, deterministic=True)
+    return conn
+
+
+RESULT_CACHE_PATH = CACHE_DIR_PATH / "results.db"
+RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Cleared by --no-cache.
+use_result_cache = True
+
+
+@functools.cache
+def open_result_cache() -> apsw.Connection:
+    CACHE_DIR_PATH.mkdir(parents=True, exist_ok=True)
+    cache = apsw.Connection(str(RESULT_CACHE_PATH))
+    cache.set_busy_timeout(2000)
+    cache.execute("PRAGMA journal_mode=WAL")
+    cache.execute(
+        "CREATE TABLE IF NOT EXISTS results (cache_key TEXT PRIMARY KEY, db TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+        "payload TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+    )
+    cache.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_used)")
+    return cache
+
+
+def cached_scan(scan: str, db_path: Path, query: str, options: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+    """Return `compute()`'s JSON-able result, reusing the one stored for the same scan of the same DB state.
+
+    The key covers the scan, query, scan options and the DB's size/mtime fingerprint (WAL included),
+    so any write by Cursor misses and purges that DB's older entries. Least recently used entries
+    are evicted once the cache exceeds RESULT_CACHE_MAX_BYTES.
+    """
+    if not use_result_cache:
+        return compute()
+    fingerprint = json.dumps(file_fingerprint(db_path), sort_keys=True)
+    cache_key = hashlib.sha256(
+        json.dumps([scan, query, options, str(db_path), fingerprint], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    cache = open_result_cache()
+    for (payload,) in cache.execute("SELECT payload FROM results WHERE cache_key = ?", (cache_key,)):
+        cache.execute("UPDATE results SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+        return json.loads(payload)
+
+    result = compute()
+    payload = json.dumps(result)
+    with cache:
+        cache.execute("DELETE FROM results WHERE db = ? AND fingerprint != ?", (str(db_path), fingerprint))
+        cache.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+            (cache_key, str(db_path), fingerprint, payload, len(payload), time.time()),
+        )
+        (total,) = next(cache.execute("SELECT COALESCE(SUM(size), 0) FROM results"))
+        if total > RESULT_CACHE_MAX_BYTES:
+            cache.execute(
+                """DELETE FROM results WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key, SUM(size) OVER (ORDER BY last_used DESC) AS running FROM results
+                    ) WHERE running > ?
+                )""",
+                (RESULT_CACHE_MAX_BYTES,),
+            )
+    return result
+
+
+def set_storage_dir(storage_dir: Path) -> None:
+    """Point every DB, History/Backups and cache path at `storage_dir` (--storage-dir).
+
+    Caches of a non-default storage dir live in their own subdirectory of CACHE_ROOT_PATH, so a
+    synthetic fixture never mixes with the real history's snapshots, catalog or results.
+    """
+    global CURSOR_STORAGE_DIR_PATH, STATE_SQLITE_PATH, STATE_VSCDB_PATH, HISTORY_DIR_PATH, BACKUPS_DIR_PATH
+    global CACHE_DIR_PATH, RESULT_CACHE_PATH, CATALOG_PATH, SEMANTIC_MATRIX_PATH
+    storage_dir = storage_dir.expanduser().resolve()
+    if storage_dir == CURSOR_STORAGE_DIR_PATH:
+        return
+    CURSOR_STORAGE_DIR_PATH = storage_dir
+    STATE_SQLITE_PATH = storage_dir / "state.sqlite"
+    STATE_VSCDB_PATH = storage_dir / "state.vscdb"
+    HISTORY_DIR_PATH = storage_dir.parent / "History"
+    BACKUPS_DIR_PATH = storage_dir.parent.parent / "Backups"
+    if storage_dir == default_storage_dir().expanduser().resolve():
+        CACHE_DIR_PATH = CACHE_ROOT_PATH
+    else:
+        CACHE_DIR_PATH = CACHE_ROOT_PATH / hashlib.sha256(str(storage_dir).encode("utf-8")).hexdigest()[:12]
+    RESULT_CACHE_PATH = CACHE_DIR_PATH / "results.db"
+    CATALOG_PATH = CACHE_DIR_PATH / "catalog.db"
+    SEMANTIC_MATRIX_PATH = CACHE_DIR_PATH / "semantic.f32"
+    if open_result_cache.cache_info().currsize:
+        open_result_cache().close()
+    open_result_cache.cache_clear()
 
 
 def list_tables(connection: apsw.Connection) -> List[str]:
@@ -130,14 +360,169 @@ def walk_names_from_json(obj: Any) -> Iterable[str]:
             yield from walk_names_from_json(item)
 
 
+# Query language: bare words and "quoted phrases" are SQLite LIKE fragments (case-insensitive
+# for ASCII, % and _ still work as wildcards), /regex/ or /regex/i is a Python regex; combine
+# with AND (implicit between terms), OR, NOT and parentheses. A query compiles to a single
+# WHERE clause, so each table is scanned once however many terms it has; regexes run inside
+# that scan through the `regexp` function registered on every connection by connect().
+QUERY_TOKEN_RE = re.compile(
+    r"""\s*(?:(?P<lparen>\()|(?P<rparen>\))|"(?P<phrase>[^"]*)"|/(?P<regex>(?:[^/\\]|\\.)+)/(?P<flags>[ims]*)(?=[\s()]|$)|(?P<word>[^\s()]+))"""
+)
+
+
+@dataclass
+class QueryNode:
+    kind: str  # "like", "regex", "and", "or", "not"
+    value: str = ""
+    children: List["QueryNode"] = field(default_factory=list)
+
+
+def tokenize_query(query: str) -> List[Tuple[str, str, str]]:
+    tokens: List[Tuple[str, str, str]] = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        m = QUERY_TOKEN_RE.match(query, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Can't parse query at: {query[pos:]!r}")
+        pos = m.end()
+        kind = m.lastgroup if m.lastgroup != "flags" else "regex"
+        if kind == "word" and m["word"] in ("AND", "OR", "NOT"):
+            tokens.append((m["word"], "", ""))
+        elif kind == "regex":
+            tokens.append(("regex", m["regex"], m["flags"] or ""))
+        else:
+            tokens.append((kind, m[kind] or "", ""))
+    return tokens
+
+
+def parse_query(query: str) -> QueryNode:
+    """Parse `query` into a QueryNode tree; raises ValueError on malformed input or regexes."""
+    tokens = tokenize_query(query)
+    pos = 0
+
+    def peek() -> Optional[str]:
+        return tokens[pos][0] if pos < len(tokens) else None
+
+    def parse_or() -> QueryNode:
+        nonlocal pos
+        children = [parse_and()]
+        while peek() == "OR":
+            pos += 1
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else QueryNode("or", children=children)
+
+    def parse_and() -> QueryNode:
+        nonlocal pos
+        children = [parse_not()]
+        while peek() not in (None, "OR", "rparen"):
+            if peek() == "AND":
+                pos += 1
+            children.append(parse_not())
+        return children[0] if len(children) == 1 else QueryNode("and", children=children)
+
+    def parse_not() -> QueryNode:
+        nonlocal pos
+        if peek() == "NOT":
+            pos += 1
+            return QueryNode("not", children=[parse_not()])
+        return parse_atom()
+
+    def parse_atom() -> QueryNode:
+        nonlocal pos
+        if pos >= len(tokens):
+            raise ValueError(f"Query ends unexpectedly: {query!r}")
+        kind, value, flags = tokens[pos]
+        pos += 1
+        if kind == "lparen":
+            node = parse_or()
+            if peek() != "rparen":
+                raise ValueError(f"Unbalanced parentheses in query: {query!r}")
+            pos += 1
+            return node
+        if kind in ("word", "phrase"):
+            return QueryNode("like", value)
+        if kind == "regex":
+            # Scoped flags, so the pattern can be embedded in query_highlight_regex's alternation.
+            pattern = f"(?{flags}:{value})" if flags else value
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Bad regex /{value}/: {e}") from None
+            return QueryNode("regex", pattern)
+        raise ValueError(f"Unexpected {kind!r} in query: {query!r}")
+
+    if not tokens:
+        raise ValueError("Empty query")
+    root = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected {tokens[pos][0]!r} in query: {query!r}")
+    return root
+
+
+def query_to_sql(node: QueryNode, column: str) -> Tuple[str, List[Any]]:
+    """WHERE-clause fragment and parameters matching `node` against `column`."""
+    if node.kind == "like":
+        return f"{column} LIKE ?", [f"%{node.value}%"]
+    if node.kind == "regex":
+        return f"regexp(?, {column})", [node.value]
+    if node.kind == "not":
+        sql, params = query_to_sql(node.children[0], column)
+        return f"NOT ({sql})", params
+    parts: List[str] = []
+    params: List[Any] = []
+    for child in node.children:
+        sql, child_params = query_to_sql(child, column)
+        parts.append(f"({sql})")
+        params += child_params
+    return f" {node.kind.upper()} ".join(parts), params
+
+
+def like_to_regex(fragment: str) -> str:
+    return "".join(".*?" if c == "%" else "." if c == "_" else re.escape(c) for c in fragment)
+
+
+def query_highlight_regex(node: QueryNode) -> Optional[str]:
+    """One alternation of every non-negated term, used to locate and count matches in text."""
+    if node.kind == "like":
+        # Match what SQLite's LIKE matched: case folded for ASCII only, and `%`/`_` spanning newlines.
+        return f"(?ais:{like_to_regex(node.value)})" if node.value else None
+    if node.kind == "regex":
+        return f"(?:{node.value})"
+    if node.kind == "not":
+        return None
+    alternatives = [p for p in (query_highlight_regex(child) for child in node.children) if p]
+    return "|".join(alternatives) or None
+
+
+@functools.lru_cache(maxsize=256)
+def compile_regex(pattern: str) -> "re.Pattern[str]":
+    return re.compile(pattern)
+
+
+def sql_regexp(pattern: str, value: Any) -> int:
+    """SQLite `regexp(pattern, value)`: 1 if the Python regex matches anywhere in the value."""
+    if value is None:
+        return 0
+    return 1 if compile_regex(pattern).search(safe_decode(value)) else 0
+
+
+def sql_regexp_count(pattern: str, value: Any) -> int:
+    """SQLite `regexp_count(pattern, value)`: number of non-overlapping matches."""
+    if value is None:
+        return 0
+    return sum(1 for _ in compile_regex(pattern).finditer(safe_decode(value)))
+
+
 def search_itemtable_for_keyword(
     connection: apsw.Connection, keyword: str, limit: int
 ) -> Iterable[str]:
     cursor = connection.cursor()
+    where, params = query_to_sql(parse_query(keyword), "value")
     try:
         for key, value in cursor.execute(
-            "SELECT key, value FROM ItemTable WHERE typeof(value) IN ('text','blob') AND value LIKE ? LIMIT ?",
-            (f"%{keyword}%", limit),
+            f"SELECT key, value FROM ItemTable WHERE typeof(value) IN ('text','blob') AND ({where}) LIMIT ?",
+            (*params, limit),
         ):
             data = try_json_loads(value)
             if data is None:
@@ -152,6 +537,7 @@ def search_generic_tables_for_keyword(
     connection: apsw.Connection, keyword: str, per_table_limit: int
 ) -> Iterable[str]:
     cursor = connection.cursor()
+    root = parse_query(keyword)
     for table in list_tables(connection):
         if table == "ItemTable":
             continue
@@ -164,8 +550,13 @@ def search_generic_tables_for_keyword(
             for c, _ in cols
             if c.lower() in {"name", "title", "label", "chat_name", "conversation_name"}
         ]
-        where = " OR ".join([f"{c} LIKE ?" for c in text_cols])
-        params: List[Any] = [f"%{keyword}%"] * len(text_cols)
+        params: List[Any] = []
+        clauses: List[str] = []
+        for c in text_cols:
+            clause, clause_params = query_to_sql(root, c)
+            clauses.append(f"({clause})")
+            params += clause_params
+        where = " OR ".join(clauses)
         try:
             selected_cols = ", ".join([*(name_cols or []), *(text_cols[:3])])
             query = f"SELECT {selected_cols} FROM {table} WHERE {where} LIMIT ?"
@@ -186,34 +577,42 @@ def search_generic_tables_for_keyword(
             continue
 
 
+def scan_names(db_path: Path, keyword: str, total_limit: int, per_table_limit: int, debug: bool = False) -> List[str]:
+    """Every chat name found in one DB, with repeats (each repeat counts as a hit)."""
+    names: List[str] = []
+    conn = connect(db_path)
+    try:
+        if debug:
+            tabs = list_tables(conn)
+            print(f"DB: {db_path}")
+            print(f"Tables: {tabs}")
+        # Prefer ItemTable if present
+        if "ItemTable" in list_tables(conn):
+            names.extend(search_itemtable_for_keyword(conn, keyword, total_limit))
+        # Also do a lightweight generic scan
+        names.extend(search_generic_tables_for_keyword(conn, keyword, per_table_limit))
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return names
+
+
 def collect_matches(
     keyword: str, total_limit: int, per_table_limit: int, debug: bool = False
 ) -> Counter:
     names: Counter = Counter()
     for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
+        scan = functools.partial(scan_names, db_path, keyword, total_limit, per_table_limit, debug)
         try:
-            conn = apsw.Connection(str(db_path))
+            if debug:
+                names.update(scan())
+            else:
+                options = {"limit": total_limit, "per_table_limit": per_table_limit}
+                names.update(cached_scan("names", db_path, keyword, options, scan))
         except Exception:
             continue
-        try:
-            if debug:
-                tabs = list_tables(conn)
-                print(f"DB: {db_path}")
-                print(f"Tables: {tabs}")
-            # Prefer ItemTable if present
-            if "ItemTable" in list_tables(conn):
-                for name in search_itemtable_for_keyword(conn, keyword, total_limit):
-                    names[name] += 1
-            # Also do a lightweight generic scan
-            for name in search_generic_tables_for_keyword(
-                conn, keyword, per_table_limit
-            ):
-                names[name] += 1
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
     return names
 
 
@@ -265,7 +664,54 @@ def parse_bubble_id_from_bubble_key(key: str) -> Optional[str]:
     return parts[2]
 
 
+# SQL-side projection of the few bubble fields we render. json_extract errors on malformed
+# JSON, so every extraction is guarded by json_valid; the raw value is shipped only for rows
+# SQLite can't parse (the last column), and those fall back to try_json_loads in Python.
+BUBBLE_PROJECTION_COLUMNS = """rowid, key,
+        CASE WHEN json_valid(CAST(value AS TEXT)) THEN json_extract(CAST(value AS TEXT), '$.type') END,
+        CASE WHEN json_valid(CAST(value AS TEXT)) THEN json_extract(CAST(value AS TEXT), '$.text') END,
+        CASE WHEN json_valid(CAST(value AS TEXT)) THEN json_extract(CAST(value AS TEXT), '$.richText') END,
+        CASE WHEN json_valid(CAST(value AS TEXT)) THEN NULL ELSE value END"""
+BUBBLE_PROJECTION_SQL = f"""
+    SELECT {BUBBLE_PROJECTION_COLUMNS}
+    FROM cursorDiskKV WHERE key LIKE ? ORDER BY rowid LIMIT ?
+"""
+
+
+def project_bubble_row(bubble_type: Any, text: Any, rich_text: Any, raw: Any) -> Dict[str, Any]:
+    """Build the minimal bubble dict from projected columns, parsing `raw` only for non-JSON rows."""
+    if raw is not None:
+        data = try_json_loads(raw)
+        if not isinstance(data, dict):
+            return {}
+        return {k: data[k] for k in ("type", "text", "richText") if k in data}
+    obj: Dict[str, Any] = {}
+    if bubble_type is not None:
+        obj["type"] = bubble_type
+    if text is not None:
+        obj["text"] = text
+    if rich_text is not None:
+        obj["richText"] = rich_text
+    return obj
+
+
 def load_thread_bubbles(conn: apsw.Connection, thread_id: str, max_bubbles: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+    """Load a thread's bubbles (type/text/richText only), projected inside SQLite."""
+    cursor = conn.cursor()
+    results: List[Tuple[int, str, Dict[str, Any]]] = []
+    try:
+        for rowid, key, bubble_type, text, rich_text, raw in cursor.execute(
+            BUBBLE_PROJECTION_SQL, (f"bubbleId:{thread_id}:%", max_bubbles)
+        ):
+            results.append((int(rowid), str(key), project_bubble_row(bubble_type, text, rich_text, raw)))
+    except apsw.SQLError:
+        # No JSON1 in this SQLite build; ship whole blobs instead.
+        return load_thread_bubbles_full(conn, thread_id, max_bubbles)
+    return results
+
+
+def load_thread_bubbles_full(conn: apsw.Connection, thread_id: str, max_bubbles: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+    """Load a thread's bubbles by decoding whole `value` blobs in Python."""
     cursor = conn.cursor()
     results: List[Tuple[int, str, Dict[str, Any]]] = []
     try:
@@ -328,26 +774,30 @@ def extract_paths_from_context(obj: Dict[str, Any]) -> List[str]:
     return unique[:5]
 
 
+# Same selection as extract_paths_from_context (string values of object members that look like
+# /Users/ paths, first five, document order), but walked by json_tree inside SQLite.
+CONTEXT_PATHS_SQL = """
+    SELECT j.atom FROM cursorDiskKV AS kv, json_tree(CAST(kv.value AS TEXT)) AS j
+    WHERE kv.key = ? AND j.type = 'text' AND typeof(j.key) = 'text'
+        AND j.atom LIKE '%/%' AND j.atom GLOB '*Users*'
+    GROUP BY j.atom ORDER BY MIN(j.id) LIMIT 5
+"""
+
+
+def load_context_paths(conn: apsw.Connection, thread_id: str, bubble_id: str) -> List[str]:
+    """File paths referenced by a bubble's messageRequestContext, extracted inside SQLite."""
+    key = f"messageRequestContext:{thread_id}:{bubble_id}"
+    try:
+        return [str(atom) for (atom,) in conn.cursor().execute(CONTEXT_PATHS_SQL, (key,))]
+    except apsw.SQLError:
+        ctx = load_message_request_context(conn, thread_id, bubble_id)
+        return extract_paths_from_context(ctx) if ctx else []
+
+
 def print_thread(conn: apsw.Connection, thread_id: str, max_bubbles: Optional[int] = None, shorten_text: bool = True) -> None:
     """Print a single thread's messages with optional limits and text shortening."""
     bubble_limit = max_bubbles if max_bubbles is not None else 999999
     
-    # Load composerData (optional)
-    comp = None
-    try:
-        row = next(conn.cursor().execute(
-            "SELECT value FROM cursorDiskKV WHERE key = ?",
-            (f"composerData:{thread_id}",),
-        ))
-        comp_s = safe_decode(row[0])
-        if comp_s.strip().startswith("{") and comp_s.strip().endswith("}"):
-            try:
-                comp = json.loads(comp_s)
-            except Exception:
-                comp = None
-    except StopIteration:
-        pass
-    
     # Load bubbles ordered by rowid
     bubbles = load_thread_bubbles(conn, thread_id, bubble_limit)
     for _, bubble_key, bubble_obj in bubbles:
@@ -364,36 +814,219 @@ def print_thread(conn: apsw.Connection, thread_id: str, max_bubbles: Optional[in
         else:
             print(f"[{role}] (no text)")
         # Context (files referenced)
-        ctx = load_message_request_context(conn, thread_id, bubble_id)
-        if ctx:
-            paths = extract_paths_from_context(ctx)
-            if paths:
-                print("    files:")
-                for p in paths:
-                    print(f"     - {p}")
+        paths = load_context_paths(conn, thread_id, bubble_id)
+        if paths:
+            print("    files:")
+            for p in paths:
+                print(f"     - {p}")
 
 
-def thread_explorer(keyword: str, max_threads: int, max_bubbles: int, debug: bool = False, shorten_text: bool = True) -> None:
-    threads_to_db: Dict[str, str] = {}
-    threads_to_hits: Dict[str, int] = defaultdict(int)
-    # First, find matching bubbles across DBs
+# Ranked search: each matching value is decoded to plain text once (SearchHit.text); match
+# spans, the score and every output format are derived from that single decode.
+RECENCY_WEIGHT = 0.5
+WINDOW_CHARS = 80
+MAX_WINDOWS = 3
+
+
+@dataclass
+class SearchHit:
+    db_name: str
+    source: str
+    rowid: int
+    text: str
+    spans: List[Tuple[int, int]] = field(default_factory=list)
+    score: float = 0.0
+
+
+def extract_text_from_json(obj: Any, max_texts: int = 5) -> List[str]:
+    """Recursively extract human-readable text from JSON structure."""
+    texts: List[str] = []
+
+    def walk(o: Any, depth: int = 0) -> None:
+        if depth > 5 or len(texts) >= max_texts:
+            return
+
+        if isinstance(o, dict):
+            # Special handling for known structures
+            if "text" in o and isinstance(o["text"], str) and o["text"].strip():
+                texts.append(o["text"].strip())
+                return
+            if "richText" in o and isinstance(o["richText"], str):
+                # richText might be JSON itself
+                try:
+                    rich = json.loads(o["richText"])
+                    walk(rich, depth + 1)
+                except Exception:
+                    pass
+
+            # Look for text-like fields
+            for key, val in o.items():
+                if key in {"_v", "type", "id", "fsPath", "external", "$mid", "diffId", "uri"}:
+                    continue  # Skip technical metadata
+                if isinstance(val, str) and len(val) > 10 and len(val) < 500:
+                    # Potential human text (not too short, not too long)
+                    if not val.startswith("{") and not val.startswith("["):
+                        texts.append(val.strip())
+                else:
+                    walk(val, depth + 1)
+
+        elif isinstance(o, list):
+            for item in o:
+                walk(item, depth + 1)
+
+    walk(obj)
+    return texts
+
+
+def extract_match_text(key: str, raw_text: str, highlight_regex: Optional[str]) -> str:
+    """Decode a matching value into the plain text shown for it, preferring fields the query matches."""
+    data = try_json_loads(raw_text)
+    if data is None:
+        return raw_text.strip()
+    # For bubbleId entries, use specialized extraction
+    if key.startswith("bubbleId:"):
+        return extract_plain_text_from_bubble(data, shorten=False) or "(no text in bubble)"
+    # For all other JSON, extract text generically
+    texts = extract_text_from_json(data, max_texts=50)
+    matching = [t for t in texts if highlight_regex and compile_regex(highlight_regex).search(t)]
+    if matching or texts:
+        return " | ".join((matching or texts)[:3])
+    # No text found, show JSON structure hint
+    return f"(JSON: {list(data.keys())[:5] if isinstance(data, dict) else 'array'})"
+
+
+def find_match_spans(text: str, highlight_regex: Optional[str]) -> List[Tuple[int, int]]:
+    """(start, end) of every non-empty match of the query's positive terms in `text`."""
+    if not highlight_regex:
+        return []
+    return [m.span() for m in compile_regex(highlight_regex).finditer(text) if m.end() > m.start()]
+
+
+def match_score(term_frequency: int, rowid: int, max_rowid: int) -> float:
+    """Sub-linear term frequency plus a recency bonus; Cursor upserts, so a higher rowid is newer."""
+    recency = rowid / max_rowid if max_rowid > 0 else 0.0
+    return math.log1p(term_frequency) + RECENCY_WEIGHT * recency
+
+
+def highlight_matches(text: str, spans: Sequence[Tuple[int, int]], start: int = 0, end: Optional[int] = None) -> str:
+    """`text[start:end]` with every match fully inside it highlighted (ANSI, only on a terminal)."""
+    end = len(text) if end is None else end
+    if not sys.stdout.isatty():
+        return text[start:end]
+    parts: List[str] = []
+    pos = start
+    for span_start, span_end in spans:
+        if span_start < pos or span_end > end:
+            continue
+        parts.append(text[pos:span_start])
+        parts.append(f"\x1b[1;33m{text[span_start:span_end]}\x1b[0m")
+        pos = span_end
+    parts.append(text[pos:end])
+    return "".join(parts)
+
+
+def context_windows(text: str, spans: Sequence[Tuple[int, int]], width: int = WINDOW_CHARS, max_windows: int = MAX_WINDOWS) -> List[str]:
+    """Up to `max_windows` single-line excerpts of `text` around the matches, overlapping ones merged."""
+    if not spans:
+        s = text.replace("\n", " ").strip()
+        return [(s[: width * 2] + "…") if len(s) > width * 2 else s]
+    windows_spans: List[List[int]] = []
+    for span_start, span_end in spans:
+        start, end = max(0, span_start - width), min(len(text), span_end + width)
+        if windows_spans and start <= windows_spans[-1][1]:
+            windows_spans[-1][1] = end
+        elif len(windows_spans) < max_windows:
+            windows_spans.append([start, end])
+        else:
+            break
+    windows: List[str] = []
+    for start, end in windows_spans:
+        window = highlight_matches(text, spans, start, end).replace("\n", " ").strip()
+        windows.append(("…" if start > 0 else "") + window + ("…" if end < len(text) else ""))
+    return windows
+
+
+def scan_snippet_matches(db_path: Path, query: str, limit: int, per_table_limit: int) -> Dict[str, Any]:
+    """Locate snippet matches in one DB: rowids for ItemTable/cursorDiskKV, values for generic columns."""
+    root = parse_query(query)
+    where, params = query_to_sql(root, "value")
+    result: Dict[str, Any] = {"tables": {}, "generic": []}
+    conn = connect(db_path)
+    cur = conn.cursor()
+    try:
+        tables = set(list_tables(conn))
+        for table, table_limit in (("ItemTable", min(100, limit)), ("cursorDiskKV", min(100, per_table_limit))):
+            if table not in tables:
+                continue
+            try:
+                (max_rowid,) = next(cur.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}"))
+                rowids = [
+                    int(rowid)
+                    for (rowid,) in cur.execute(
+                        f"SELECT rowid FROM {table} WHERE typeof(value) IN ('text','blob') AND ({where}) LIMIT ?",
+                        (*params, table_limit),
+                    )
+                ]
+                result["tables"][table] = {"max_rowid": max_rowid, "rowids": rowids}
+            except apsw.SQLError:
+                pass
+        # Generic tables text columns
+        for table in tables:
+            if table in {"ItemTable", "cursorDiskKV"}:
+                continue
+            cols = table_columns(conn, table)
+            text_cols = [c for c, t in cols if is_text_affinity(t)]
+            for col in text_cols[:2]:
+                try:
+                    col_where, col_params = query_to_sql(root, col)
+                    sql = f"SELECT {col} FROM {table} WHERE typeof({col}) IN ('text','blob') AND ({col_where}) LIMIT ?"
+                    for (value,) in cur.execute(sql, (*col_params, 5)):
+                        result["generic"].append((f"{table}.{col}", safe_decode(value)))
+                except apsw.SQLError:
+                    continue
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return result
+
+
+def scan_snippet_hits(query: str, limit: int, per_table_limit: int) -> List[SearchHit]:
+    """Collect and score matching values from ItemTable, cursorDiskKV and generic text columns."""
+    hits: List[SearchHit] = []
+    highlight_regex = query_highlight_regex(parse_query(query))
     for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
         try:
-            conn = apsw.Connection(str(db_path))
+            options = {"limit": limit, "per_table_limit": per_table_limit}
+            scan = functools.partial(scan_snippet_matches, db_path, query, limit, per_table_limit)
+            result = cached_scan("snippets", db_path, query, options, scan)
         except Exception:
             continue
-        cur = conn.cursor()
-        try:
-            for key, value in cur.execute(
-                "SELECT key, value FROM cursorDiskKV WHERE key LIKE 'bubbleId:%' AND typeof(value) IN ('text','blob') AND value LIKE ? LIMIT 2000",
-                (f"%{keyword}%",),
-            ):
-                key_str = str(key)
-                thread_id = parse_thread_id_from_bubble_key(key_str)
-                if not thread_id:
-                    continue
-                threads_to_db.setdefault(thread_id, str(db_path.name))
-                threads_to_hits[thread_id] += 1
+        for source, value in result["generic"]:
+            text = extract_match_text("", value, highlight_regex)
+            spans = find_match_spans(text, highlight_regex)
+            hits.append(SearchHit(db_path.name, source, 0, text, spans, match_score(len(spans), 0, 0)))
+        if not any(matches["rowids"] for matches in result["tables"].values()):
+            continue
+        try:
+            conn = connect(db_path)
+        except Exception:
+            continue
+        try:
+            for table, matches in result["tables"].items():
+                rowids = matches["rowids"]
+                # Point lookups by rowid; the scan that found them is what the cache saves.
+                placeholders = ", ".join("?" * len(rowids))
+                for rowid, key, value in conn.cursor().execute(
+                    f"SELECT rowid, key, value FROM {table} WHERE rowid IN ({placeholders})", rowids
+                ):
+                    text = extract_match_text(str(key), safe_decode(value), highlight_regex)
+                    spans = find_match_spans(text, highlight_regex)
+                    hits.append(SearchHit(
+                        db_path.name, f"{table} key={key}", int(rowid), text, spans,
+                        match_score(len(spans), int(rowid), matches["max_rowid"]),
+                    ))
         except apsw.SQLError:
             pass
         finally:
@@ -401,13 +1034,77 @@ def thread_explorer(keyword: str, max_threads: int, max_bubbles: int, debug: boo
                 conn.close()
             except Exception:
                 pass
+    hits.sort(key=lambda h: -h.score)
+    return hits
+
+
+def print_search_hits(hits: Sequence[SearchHit], shorten: bool = True) -> None:
+    for hit in hits:
+        print(f"- [{hit.db_name}] {hit.source} (matches: {len(hit.spans)}, score: {hit.score:.2f})")
+        if shorten:
+            for window in context_windows(hit.text, hit.spans):
+                print(f"    {window}")
+        else:
+            print(highlight_matches(hit.text, hit.spans))
+
+
+def scan_bubble_hits(db_path: Path, keyword: str) -> Dict[str, Any]:
+    """Key, rowid and term frequency of each bubble matching `keyword`, plus the DB's max rowid."""
+    root = parse_query(keyword)
+    where, params = query_to_sql(root, "value")
+    highlight_regex = query_highlight_regex(root) or "$^"
+    result: Dict[str, Any] = {"max_rowid": 0, "hits": []}
+    conn = connect(db_path)
+    cur = conn.cursor()
+    try:
+        (result["max_rowid"],) = next(cur.execute("SELECT COALESCE(MAX(rowid), 0) FROM cursorDiskKV"))
+        # Only the key, rowid and term frequency are needed to rank a hit, so only those come back
+        # as rows. regexp/regexp_count are Python UDFs (see connect), so each value that gets past
+        # the key filter is still handed to Python once, inside the scan.
+        for key, rowid, term_frequency in cur.execute(
+            f"""SELECT key, rowid, regexp_count(?, value)
+            FROM cursorDiskKV WHERE key LIKE 'bubbleId:%' AND typeof(value) IN ('text','blob') AND ({where}) LIMIT 2000""",
+            (highlight_regex, *params),
+        ):
+            result["hits"].append((str(key), int(rowid), int(term_frequency or 0)))
+    except apsw.SQLError:
+        pass
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return result
+
+
+def thread_explorer(keyword: str, max_threads: int, max_bubbles: int, debug: bool = False, shorten_text: bool = True) -> None:
+    threads_to_db: Dict[str, str] = {}
+    threads_to_hits: Dict[str, int] = defaultdict(int)
+    threads_to_scores: Dict[str, float] = defaultdict(float)
+    # First, find matching bubbles across DBs
+    for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
+        try:
+            result = cached_scan("bubbles", db_path, keyword, {}, functools.partial(scan_bubble_hits, db_path, keyword))
+        except Exception:
+            continue
+        threads_to_last_rowid: Dict[str, int] = {}
+        for key, rowid, term_frequency in result["hits"]:
+            thread_id = parse_thread_id_from_bubble_key(key)
+            if not thread_id:
+                continue
+            threads_to_db.setdefault(thread_id, str(db_path.name))
+            threads_to_hits[thread_id] += 1
+            threads_to_scores[thread_id] += math.log1p(max(term_frequency, 1))
+            threads_to_last_rowid[thread_id] = max(threads_to_last_rowid.get(thread_id, 0), rowid)
+        for thread_id, last_rowid in threads_to_last_rowid.items():
+            threads_to_scores[thread_id] += match_score(0, last_rowid, result["max_rowid"])
 
     if not threads_to_hits:
         print("No threads found containing the keyword.")
         return
 
-    # Rank threads by hit count
-    ranked_threads = sorted(threads_to_hits.items(), key=lambda kv: (-kv[1], kv[0]))[:max_threads]
+    # Rank threads by term frequency of their matching bubbles plus recency of the latest one
+    ranked_threads = sorted(threads_to_hits.items(), key=lambda kv: (-threads_to_scores[kv[0]], kv[0]))[:max_threads]
 
     for idx, (thread_id, hit_count) in enumerate(ranked_threads, start=1):
         db_name = threads_to_db.get(thread_id, "?")
@@ -415,7 +1112,7 @@ def thread_explorer(keyword: str, max_threads: int, max_bubbles: int, debug: boo
         # Open the specific DB that had the thread
         db_path = STATE_SQLITE_PATH if db_name == STATE_SQLITE_PATH.name else STATE_VSCDB_PATH
         try:
-            conn = apsw.Connection(str(db_path))
+            conn = connect(db_path)
         except Exception:
             print("  (Cannot open DB)")
             continue
@@ -433,7 +1130,7 @@ def print_thread_by_id(thread_id: str) -> None:
     found = False
     for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
         try:
-            conn = apsw.Connection(str(db_path))
+            conn = connect(db_path)
         except Exception:
             continue
         try:
@@ -469,32 +1166,1297 @@ def print_thread_by_id(thread_id: str) -> None:
         print(f"Thread ID '{thread_id}' not found in any database.")
 
 
-def is_thread_id(query: str) -> bool:
-    """Check if query looks like a thread ID (UUID format)."""
-    pattern = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
-    return bool(re.match(pattern, query, re.IGNORECASE))
+CATALOG_PATH = CACHE_DIR_PATH / "catalog.db"
+CATALOG_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sources (db TEXT PRIMARY KEY, fingerprint TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS source_rowids (
+        db TEXT PRIMARY KEY,
+        last_rowid INTEGER NOT NULL,
+        composer_count INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS threads (
+        db TEXT NOT NULL,
+        thread_id TEXT NOT NULL,
+        title TEXT,
+        bubble_count INTEGER NOT NULL,
+        first_rowid INTEGER NOT NULL,
+        last_rowid INTEGER NOT NULL,
+        total_bytes INTEGER NOT NULL,
+        file_count INTEGER NOT NULL DEFAULT 0,
+        created_at INTEGER,
+        last_updated_at INTEGER,
+        PRIMARY KEY (db, thread_id)
+    );
+    CREATE INDEX IF NOT EXISTS threads_recency ON threads (last_updated_at DESC, last_rowid DESC);
+    CREATE INDEX IF NOT EXISTS threads_size ON threads (total_bytes DESC);
+    CREATE TABLE IF NOT EXISTS thread_files (
+        db TEXT NOT NULL,
+        thread_id TEXT NOT NULL,
+        path TEXT NOT NULL,
+        PRIMARY KEY (db, thread_id, path)
+    );
+"""
+# Key families are scanned as ranges on the key index ('bubbleId:' <= key < 'bubbleId;'),
+# which LIKE 'bubbleId:%' can't use; each row of cursorDiskKV is visited at most once. The
+# ranges are parameters so the same queries can re-aggregate a single thread
+# ('bubbleId:<id>:' <= key < 'bubbleId:<id>;').
+CATALOG_THREADS_SQL = """
+    WITH bubbles AS (
+        SELECT substr(key, 10, instr(substr(key, 10), ':') - 1) AS thread_id,
+            COUNT(*) AS bubble_count, MIN(rowid) AS first_rowid, MAX(rowid) AS last_rowid,
+            SUM(length(CAST(value AS BLOB))) AS total_bytes
+        FROM cursorDiskKV WHERE key >= :bubbles_from AND key < :bubbles_to
+        GROUP BY 1
+    ), composers AS (
+        SELECT substr(key, 14) AS thread_id,
+            CASE WHEN json_valid(CAST(value AS TEXT)) THEN json_extract(CAST(value AS TEXT), '$.name') END AS title,
+            CASE WHEN json_valid(CAST(value AS TEXT)) THEN json_extract(CAST(value AS TEXT), '$.createdAt') END AS created_at,
+            CASE WHEN json_valid(CAST(value AS TEXT)) THEN json_extract(CAST(value AS TEXT), '$.lastUpdatedAt') END AS last_updated_at
+        FROM cursorDiskKV WHERE key >= :composers_from AND key < :composers_to
+    )
+    SELECT b.thread_id, c.title, b.bubble_count, b.first_rowid, b.last_rowid, b.total_bytes,
+        c.created_at, c.last_updated_at
+    FROM bubbles AS b LEFT JOIN composers AS c USING (thread_id)
+"""
+CATALOG_FILES_SQL = """
+    SELECT substr(kv.key, 23, instr(substr(kv.key, 23), ':') - 1), j.atom
+    FROM cursorDiskKV AS kv,
+        json_tree(CASE WHEN json_valid(CAST(kv.value AS TEXT)) THEN CAST(kv.value AS TEXT) ELSE '{}' END) AS j
+    WHERE kv.key >= :contexts_from AND kv.key < :contexts_to
+        AND j.type = 'text' AND typeof(j.key) = 'text'
+        AND j.atom LIKE '%/%' AND j.atom GLOB '*Users*'
+    GROUP BY 1, 2
+"""
+CATALOG_ALL_RANGES = {
+    "bubbles_from": "bubbleId:", "bubbles_to": "bubbleId;",
+    "composers_from": "composerData:", "composers_to": "composerData;",
+    "contexts_from": "messageRequestContext:", "contexts_to": "messageRequestContext;",
+}
+# Threads with any catalogued row written after a given rowid: a rowid range scan, not a key scan.
+CATALOG_TOUCHED_THREADS_SQL = """
+    SELECT DISTINCT CASE
+        WHEN key >= 'bubbleId:' AND key < 'bubbleId;' THEN substr(key, 10, instr(substr(key, 10), ':') - 1)
+        WHEN key >= 'composerData:' AND key < 'composerData;' THEN substr(key, 14)
+        WHEN key >= 'messageRequestContext:' AND key < 'messageRequestContext;'
+            THEN substr(key, 23, instr(substr(key, 23), ':') - 1)
+    END
+    FROM cursorDiskKV WHERE rowid > ?
+"""
+CATALOG_SOURCE_STATE_SQL = """
+    SELECT (SELECT COALESCE(MAX(rowid), 0) FROM cursorDiskKV),
+        (SELECT COUNT(*) FROM cursorDiskKV WHERE key >= 'composerData:' AND key < 'composerData;')
+"""
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(
-        description="Search Cursor state DBs for conversations by keyword or print a specific thread by ID",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter
-    )
-    parser.add_argument(
-        "query",
-        help="Thread ID (UUID format) to print in full, or keyword to search for (SQLite LIKE; case-insensitive for ASCII)",
+def thread_catalog_ranges(thread_id: str) -> Dict[str, str]:
+    """CATALOG_*_SQL parameters restricting the aggregate to one thread's keys."""
+    return {
+        "bubbles_from": f"bubbleId:{thread_id}:", "bubbles_to": f"bubbleId:{thread_id};",
+        "composers_from": f"composerData:{thread_id}", "composers_to": f"composerData:{thread_id};",
+        "contexts_from": f"messageRequestContext:{thread_id}:", "contexts_to": f"messageRequestContext:{thread_id};",
+    }
+
+
+def open_catalog() -> apsw.Connection:
+    """Open the thread catalog, refreshing the rows of any source DB Cursor has written to since.
+
+    A refresh re-aggregates only the threads with rows written after the last one catalogued
+    (rowids only grow), so an unrelated ItemTable write or a WAL checkpoint costs a rowid range
+    scan. A DB that shrank (vacuumed, or a thread deleted) is rebuilt in full, and the rows of a
+    DB that's gone are dropped.
+    """
+    CACHE_DIR_PATH.mkdir(parents=True, exist_ok=True)
+    catalog, is_new = warm_connection(f"catalog:{CATALOG_PATH}", CATALOG_PATH)
+    if is_new:
+        catalog.execute("PRAGMA journal_mode=WAL")
+        catalog.execute(CATALOG_SCHEMA)
+    for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
+        if not db_path.exists():
+            # Checked before connecting, which would create an empty file in its place.
+            drop_catalog_source(catalog, db_path.name)
+            continue
+        fingerprint = json.dumps(file_fingerprint(db_path), sort_keys=True)
+        stored = list(catalog.execute("SELECT fingerprint FROM sources WHERE db = ?", (db_path.name,)))
+        if stored and stored[0][0] == fingerprint:
+            continue
+        try:
+            conn = connect(db_path)
+        except Exception:
+            continue
+        try:
+            if "cursorDiskKV" not in list_tables(conn):
+                build_catalog(catalog, conn, db_path.name, fingerprint, 0, 0)
+                continue
+            max_rowid, composer_count = next(conn.cursor().execute(CATALOG_SOURCE_STATE_SQL))
+            previous = list(catalog.execute(
+                "SELECT last_rowid, composer_count FROM source_rowids WHERE db = ?", (db_path.name,)
+            ))
+            if stored and previous and max_rowid >= previous[0][0] and composer_count >= previous[0][1]:
+                update_catalog(catalog, conn, db_path.name, fingerprint, previous[0][0], max_rowid, composer_count)
+            else:
+                build_catalog(catalog, conn, db_path.name, fingerprint, max_rowid, composer_count)
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    return catalog
+
+
+def drop_catalog_source(catalog: apsw.Connection, db_name: str) -> None:
+    with catalog:
+        for table in ("threads", "thread_files", "sources", "source_rowids"):
+            catalog.execute(f"DELETE FROM {table} WHERE db = ?", (db_name,))
+
+
+def build_catalog(
+    catalog: apsw.Connection, conn: apsw.Connection, db_name: str, fingerprint: str, max_rowid: int, composer_count: int
+) -> None:
+    """Replace `db_name`'s catalog rows with a fresh aggregate of its cursorDiskKV."""
+    if "cursorDiskKV" in list_tables(conn):
+        threads = list(conn.cursor().execute(CATALOG_THREADS_SQL, CATALOG_ALL_RANGES))
+        files = list(conn.cursor().execute(CATALOG_FILES_SQL, CATALOG_ALL_RANGES))
+    else:
+        threads, files = [], []
+    with catalog:
+        catalog.execute("DELETE FROM threads WHERE db = ?", (db_name,))
+        catalog.execute("DELETE FROM thread_files WHERE db = ?", (db_name,))
+        store_catalog_rows(catalog, db_name, threads, files)
+        catalog.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (db_name, fingerprint))
+        catalog.execute("INSERT OR REPLACE INTO source_rowids VALUES (?, ?, ?)", (db_name, max_rowid, composer_count))
+
+
+def update_catalog(
+    catalog: apsw.Connection,
+    conn: apsw.Connection,
+    db_name: str,
+    fingerprint: str,
+    last_rowid: int,
+    max_rowid: int,
+    composer_count: int,
+) -> None:
+    """Re-aggregate just the threads with rows written after `last_rowid`."""
+    touched = [str(t) for (t,) in conn.cursor().execute(CATALOG_TOUCHED_THREADS_SQL, (last_rowid,)) if t]
+    threads: List[Tuple[Any, ...]] = []
+    files: List[Tuple[Any, ...]] = []
+    for thread_id in touched:
+        ranges = thread_catalog_ranges(thread_id)
+        threads += conn.cursor().execute(CATALOG_THREADS_SQL, ranges)
+        files += conn.cursor().execute(CATALOG_FILES_SQL, ranges)
+    with catalog:
+        catalog.executemany("DELETE FROM threads WHERE db = ? AND thread_id = ?", [(db_name, t) for t in touched])
+        catalog.executemany("DELETE FROM thread_files WHERE db = ? AND thread_id = ?", [(db_name, t) for t in touched])
+        store_catalog_rows(catalog, db_name, threads, files)
+        catalog.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (db_name, fingerprint))
+        catalog.execute("INSERT OR REPLACE INTO source_rowids VALUES (?, ?, ?)", (db_name, max_rowid, composer_count))
+
+
+def store_catalog_rows(
+    catalog: apsw.Connection, db_name: str, threads: List[Tuple[Any, ...]], files: List[Tuple[Any, ...]]
+) -> None:
+    file_counts = Counter(thread_id for thread_id, _ in files)
+    catalog.executemany(
+        "INSERT INTO threads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (db_name, thread_id, title, count, first, last, size, file_counts[thread_id], created, updated)
+            for thread_id, title, count, first, last, size, created, updated in threads
+        ],
     )
-    parser.add_argument(
-        "--limit",
-        type=int,
-        default=500,
-        help="Max matches to pull from ItemTable per DB",
+    catalog.executemany(
+        "INSERT OR IGNORE INTO thread_files VALUES (?, ?, ?)",
+        [(db_name, thread_id, path) for thread_id, path in files],
     )
-    parser.add_argument(
-        "--per-table-limit",
-        type=int,
-        default=50,
-        help="Max rows to pull per generic table",
+
+
+def format_size(num_bytes: int) -> str:
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_timestamp_ms(timestamp_ms: Optional[int]) -> str:
+    if not timestamp_ms:
+        return f"{'-':<16}"
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime("%Y-%m-%d %H:%M")
+
+
+def print_thread_list(sort: str, page: int, page_size: int) -> None:
+    """Print one page of the thread catalog, newest or largest first."""
+    order_by = {
+        "recent": "COALESCE(last_updated_at, created_at, 0) DESC, last_rowid DESC",
+        "size": "total_bytes DESC",
+    }[sort]
+    catalog = open_catalog()
+    try:
+        (total,) = next(catalog.execute("SELECT COUNT(*) FROM threads"))
+        if not total:
+            print("No threads found.")
+            return
+        pages = (total + page_size - 1) // page_size
+        offset = (page - 1) * page_size
+        print(f"Threads by {sort} — page {page}/{pages} ({total} threads)\n")
+        rows = catalog.execute(
+            f"SELECT db, thread_id, title, bubble_count, total_bytes, file_count, created_at, last_updated_at "
+            f"FROM threads ORDER BY {order_by} LIMIT ? OFFSET ?",
+            (page_size, offset),
+        )
+        for idx, (db_name, thread_id, title, count, size, file_count, created, updated) in enumerate(rows, start=offset + 1):
+            when = format_timestamp_ms(updated or created)
+            print(f"{idx:>4}. {thread_id}  {when}  {count:>4} msgs  {format_size(size):>9}  {file_count:>3} files  [{db_name}]  {title or '(untitled)'}")
+    finally:
+        catalog.close()
+
+
+# Per-thread role counts for --stats, one pass over the bubble key range per DB (cached like scans).
+STATS_ROLES_SQL = """
+    SELECT substr(key, 10, instr(substr(key, 10), ':') - 1) AS thread_id, SUM(type = 1), SUM(type = 2)
+    FROM (
+        SELECT key, CASE WHEN json_valid(CAST(value AS TEXT)) THEN json_extract(CAST(value AS TEXT), '$.type') END AS type
+        FROM cursorDiskKV WHERE key >= 'bubbleId:' AND key < 'bubbleId;'
+    )
+    GROUP BY 1
+"""
+STATS_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from how i if in into is it its me my of on or so that the "
+    "this to up use using we what when why with you your".split()
+)
+
+
+def scan_role_counts(db_path: Path) -> List[Tuple[str, int, int]]:
+    def compute() -> List[Tuple[str, int, int]]:
+        conn = connect(db_path)
+        try:
+            if "cursorDiskKV" not in list_tables(conn):
+                return []
+            return [(str(t), int(u or 0), int(a or 0)) for t, u, a in conn.cursor().execute(STATS_ROLES_SQL)]
+        except apsw.SQLError:
+            return []
+        finally:
+            conn.close()
+
+    return [tuple(row) for row in cached_scan("roles", db_path, "", {}, compute)]
+
+
+def load_stats_frames() -> Tuple[Any, Any]:
+    """The catalog's threads (with per-thread user/assistant counts) and thread_files as DataFrames."""
+    import pandas as pd
+
+    catalog = open_catalog()
+    try:
+        threads = pd.DataFrame.from_records(
+            list(catalog.execute(
+                "SELECT db, thread_id, title, bubble_count, total_bytes, file_count, created_at, last_updated_at FROM threads"
+            )),
+            columns=["db", "thread_id", "title", "bubble_count", "total_bytes", "file_count", "created_at", "last_updated_at"],
+        )
+        files = pd.DataFrame.from_records(
+            list(catalog.execute("SELECT db, thread_id, path FROM thread_files")), columns=["db", "thread_id", "path"]
+        )
+    finally:
+        catalog.close()
+    roles = pd.DataFrame.from_records(
+        [(db_path.name, *row) for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH) if db_path.exists() for row in scan_role_counts(db_path)],
+        columns=["db", "thread_id", "user", "assistant"],
+    )
+    threads = threads.merge(roles, on=["db", "thread_id"], how="left")
+    threads[["user", "assistant"]] = threads[["user", "assistant"]].fillna(0).astype("int64")
+    return threads, files
+
+
+def print_stats(top: int) -> None:
+    """Usage statistics over the thread catalog: activity over time, thread lengths, roles, files, repos, topics."""
+    import numpy as np
+    import pandas as pd
+
+    threads, files = load_stats_frames()
+    if threads.empty:
+        print("No threads found.")
+        return
+    started = pd.to_datetime(threads["created_at"].fillna(threads["last_updated_at"]), unit="ms", errors="coerce")
+    ended = pd.to_datetime(threads["last_updated_at"].fillna(threads["created_at"]), unit="ms", errors="coerce")
+    threads["day"] = started.dt.normalize()
+    threads["minutes"] = (ended - started).dt.total_seconds() / 60
+
+    user, assistant = int(threads["user"].sum()), int(threads["assistant"].sum())
+    print(f"{len(threads):,} threads, {int(threads['bubble_count'].sum()):,} messages "
+          f"({user:,} user / {assistant:,} assistant, {assistant / max(user, 1):.2f} assistant per user), "
+          f"{format_size(int(threads['total_bytes'].sum()))}")
+    if started.notna().any():
+        print(f"From {started.min():%Y-%m-%d} to {ended.max():%Y-%m-%d}")
+
+    dated = threads.dropna(subset=["day"])
+    if not dated.empty:
+        per_day = dated.groupby("day").agg(threads=("thread_id", "size"), messages=("bubble_count", "sum"))
+        print(f"\nLast {min(top, len(per_day))} active days:")
+        for day, row in per_day.tail(top).iloc[::-1].iterrows():
+            print(f"  {day:%Y-%m-%d}  {row.threads:>5} threads  {row.messages:>7,} msgs")
+        per_month = per_day.resample("MS").sum()
+        print("\nPer month:")
+        peak = max(int(per_month["messages"].max()), 1)
+        for month, row in per_month.iterrows():
+            bar = "#" * int(np.ceil(40 * row.messages / peak)) if row.messages else ""
+            print(f"  {month:%Y-%m}  {row.threads:>5} threads  {row.messages:>7,} msgs  {bar}")
+
+    quantiles = [0.5, 0.9, 1.0]
+    lengths = threads["bubble_count"].quantile(quantiles)
+    durations = threads["minutes"].dropna().quantile(quantiles)
+    per_thread_ratio = (threads["assistant"] / threads["user"].where(threads["user"] > 0)).dropna()
+    print("\nThread length (median / p90 / max):")
+    print(f"  messages   {lengths.iloc[0]:8.0f} {lengths.iloc[1]:8.0f} {lengths.iloc[2]:8.0f}")
+    if not durations.empty:
+        print(f"  minutes    {durations.iloc[0]:8.0f} {durations.iloc[1]:8.0f} {durations.iloc[2]:8.0f}")
+    if not per_thread_ratio.empty:
+        ratios = per_thread_ratio.quantile(quantiles)
+        print(f"  asst/user  {ratios.iloc[0]:8.2f} {ratios.iloc[1]:8.2f} {ratios.iloc[2]:8.2f}")
+
+    if not files.empty:
+        print("\nTop files (threads mentioning them):")
+        for path, count in files["path"].value_counts().head(top).items():
+            print(f"  {count:>5}  {path}")
+        # A "repo" is the first two directories under the home dir: /Users/me/src/app/x.py -> ~/src/app.
+        parts = files["path"].str.extract(r"^/(?:Users|home)/[^/]+/([^/]+)/([^/]+)/")
+        repos = ("~/" + parts[0] + "/" + parts[1]).dropna()
+        repo_threads = pd.DataFrame({"repo": repos, "thread": files.loc[repos.index, "db"] + ":" + files.loc[repos.index, "thread_id"]})
+        if not repo_threads.empty:
+            print("\nTop repos (threads touching them):")
+            for repo, count in repo_threads.drop_duplicates().groupby("repo").size().nlargest(top).items():
+                print(f"  {count:>5}  {repo}")
+
+    words = threads["title"].dropna().str.lower().str.findall(r"[a-z][a-z0-9_+#.-]{2,}").explode().dropna()
+    words = words[~words.isin(STATS_STOPWORDS)]
+    if not words.empty:
+        print("\nTop title words:")
+        print("  " + ", ".join(f"{word} ({count})" for word, count in words.value_counts().head(top).items()))
+
+
+SEMANTIC_MATRIX_PATH = CACHE_DIR_PATH / "semantic.f32"
+SEMANTIC_HASH_DIM = 512
+SEMANTIC_CHUNK_CHARS = 1000
+SEMANTIC_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+SEMANTIC_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS semantic_meta (embedder TEXT NOT NULL, dim INTEGER NOT NULL, vectors INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS semantic_sources (db TEXT PRIMARY KEY, last_rowid INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS semantic_chunks (
+        vec_row INTEGER PRIMARY KEY,
+        db TEXT NOT NULL,
+        thread_id TEXT NOT NULL,
+        bubble_key TEXT NOT NULL,
+        role INTEGER,
+        text TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS semantic_chunks_bubble ON semantic_chunks (db, bubble_key);
+"""
+# Every bubble written after `last_rowid`. Cursor upserts with INSERT OR REPLACE, so an edited
+# bubble comes back with a fresh rowid and is picked up here too.
+BUBBLES_SINCE_SQL = f"""
+    SELECT {BUBBLE_PROJECTION_COLUMNS}
+    FROM cursorDiskKV WHERE key >= 'bubbleId:' AND key < 'bubbleId;' AND rowid > ? ORDER BY rowid
+"""
+
+
+class HashedNgramEmbedder:
+    """Signed feature hashing of word unigrams and character trigrams; no model download needed."""
+
+    # v2: bucket 0 used to be always positive (its sign was folded into the index as -0).
+    name = f"hash-ngram-v2-{SEMANTIC_HASH_DIM}"
+    dim = SEMANTIC_HASH_DIM
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, gram: str) -> Tuple[int, float]:
+        """(column, sign) for a gram. The sign comes from the top hash bit, the column from the rest."""
+        # crc32 rather than hash(): str hashes are salted per process and the index is persistent.
+        bucket = self._buckets.get(gram)
+        if bucket is None:
+            h = zlib.crc32(gram.encode("utf-8"))
+            bucket = ((h & 0x7FFFFFFF) % self.dim, 1.0 if h & 0x80000000 else -1.0)
+            self._buckets[gram] = bucket
+        return bucket
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            grams: Counter = Counter()
+            for word in re.findall(r"\w+", text.lower()):
+                grams[word] += 1
+                padded = f" {word} "
+                for j in range(len(padded) - 2):
+                    grams[padded[j : j + 3]] += 1
+            for gram, count in grams.items():
+                column, sign = self._bucket(gram)
+                matrix[i, column] += (1.0 + math.log(count)) * sign
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-9)
+
+
+class ModelEmbedder:
+    """Small local CPU sentence-embedding model through fastembed (ONNX runtime)."""
+
+    name = f"fastembed:{SEMANTIC_MODEL_NAME}"
+
+    def __init__(self) -> None:
+        from fastembed import TextEmbedding
+
+        self._model = TextEmbedding(SEMANTIC_MODEL_NAME)
+        self.dim = len(next(iter(self._model.embed(["probe"]))))
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+
+        matrix = np.asarray(list(self._model.embed(list(texts))), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-9)
+
+
+@functools.cache
+def get_embedder() -> Any:
+    """The local model when fastembed is installed and loads, else the hashed n-gram fallback."""
+    try:
+        return ModelEmbedder()
+    except Exception:
+        return HashedNgramEmbedder()
+
+
+def chunk_text(text: str, max_chars: int = SEMANTIC_CHUNK_CHARS) -> List[str]:
+    """Split text into chunks of at most `max_chars`, preferring paragraph then word boundaries."""
+    text = text.strip()
+    chunks: List[str] = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n\n", 0, max_chars)
+        if cut < max_chars // 2:
+            cut = text.rfind(" ", 0, max_chars)
+        if cut < max_chars // 2:
+            cut = max_chars
+        chunks.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def update_semantic_index(catalog: apsw.Connection, embedder: Any) -> int:
+    """Embed bubbles written since the last update and append them to the vector matrix.
+
+    Returns the number of vectors in the matrix. Rows of replaced bubbles stay in the matrix but
+    lose their semantic_chunks entry, which is what search treats as the live set.
+    """
+    catalog.execute(SEMANTIC_SCHEMA)
+    meta = list(catalog.execute("SELECT embedder, dim, vectors FROM semantic_meta"))
+    matrix_bytes = SEMANTIC_MATRIX_PATH.stat().st_size if SEMANTIC_MATRIX_PATH.exists() else 0
+    if (
+        not meta
+        or meta[0][0] != embedder.name
+        or meta[0][1] != embedder.dim
+        or matrix_bytes < meta[0][2] * embedder.dim * 4
+    ):
+        with catalog:
+            catalog.execute("DELETE FROM semantic_meta")
+            catalog.execute("DELETE FROM semantic_sources")
+            catalog.execute("DELETE FROM semantic_chunks")
+            catalog.execute("INSERT INTO semantic_meta VALUES (?, ?, 0)", (embedder.name, embedder.dim))
+        SEMANTIC_MATRIX_PATH.unlink(missing_ok=True)
+        vectors = 0
+    else:
+        vectors = meta[0][2]
+    # Drop rows a crashed run appended past the committed count.
+    with open(SEMANTIC_MATRIX_PATH, "ab") as f:
+        f.truncate(vectors * embedder.dim * 4)
+
+    for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
+        stored = list(catalog.execute("SELECT last_rowid FROM semantic_sources WHERE db = ?", (db_path.name,)))
+        last_rowid = stored[0][0] if stored else 0
+        try:
+            conn = connect(db_path)
+        except Exception:
+            continue
+        try:
+            if "cursorDiskKV" not in list_tables(conn):
+                continue
+            (max_rowid,) = next(conn.cursor().execute("SELECT COALESCE(MAX(rowid), 0) FROM cursorDiskKV"))
+            if max_rowid < last_rowid:
+                # The DB was rebuilt (e.g. vacuumed into a new file); re-embed it from scratch.
+                catalog.execute("DELETE FROM semantic_chunks WHERE db = ?", (db_path.name,))
+                last_rowid = 0
+            keys: List[str] = []
+            rows: List[Tuple[str, str, str, Any, str]] = []
+            for rowid, key, bubble_type, text, rich_text, raw in conn.cursor().execute(BUBBLES_SINCE_SQL, (last_rowid,)):
+                last_rowid = max(last_rowid, int(rowid))
+                keys.append(str(key))
+                bubble_obj = project_bubble_row(bubble_type, text, rich_text, raw)
+                for chunk in chunk_text(extract_plain_text_from_bubble(bubble_obj, shorten=False)):
+                    rows.append((db_path.name, parse_thread_id_from_bubble_key(str(key)) or "", str(key), bubble_obj.get("type"), chunk))
+        except apsw.SQLError:
+            continue
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+        with catalog:
+            catalog.executemany(
+                "DELETE FROM semantic_chunks WHERE db = ? AND bubble_key = ?", [(db_path.name, k) for k in keys]
+            )
+            for start in range(0, len(rows), 256):
+                batch = rows[start : start + 256]
+                matrix = embedder.embed([chunk for *_, chunk in batch])
+                with open(SEMANTIC_MATRIX_PATH, "ab") as f:
+                    f.write(matrix.astype("float32").tobytes())
+                catalog.executemany(
+                    "INSERT INTO semantic_chunks VALUES (?, ?, ?, ?, ?, ?)",
+                    [(vectors + i, *row) for i, row in enumerate(batch)],
+                )
+                vectors += len(batch)
+            catalog.execute("UPDATE semantic_meta SET vectors = ?", (vectors,))
+            catalog.execute("INSERT OR REPLACE INTO semantic_sources VALUES (?, ?)", (db_path.name, last_rowid))
+    return vectors
+
+
+def semantic_search(query: str, top_k: int) -> None:
+    """Print the `top_k` bubble chunks closest to `query` by cosine similarity."""
+    import numpy as np
+
+    embedder = get_embedder()
+    catalog = open_catalog()
+    try:
+        vectors = update_semantic_index(catalog, embedder)
+        if not vectors:
+            print("No messages indexed.")
+            return
+        matrix = np.memmap(SEMANTIC_MATRIX_PATH, dtype=np.float32, mode="r", shape=(vectors, embedder.dim))
+        scores = matrix @ embedder.embed([query])[0]
+        # Over-fetch: some rows belong to replaced bubbles and are skipped below.
+        candidates = min(len(scores), top_k * 4)
+        best = np.argpartition(-scores, candidates - 1)[:candidates]
+        best = best[np.argsort(-scores[best])]
+        shown = 0
+        for vec_row in best:
+            row = list(catalog.execute(
+                "SELECT c.db, c.thread_id, c.role, c.text, t.title FROM semantic_chunks AS c "
+                "LEFT JOIN threads AS t USING (db, thread_id) WHERE c.vec_row = ?",
+                (int(vec_row),),
+            ))
+            if not row:
+                continue
+            db_name, thread_id, role_type, text, title = row[0]
+            shown += 1
+            role = "U" if role_type == 1 else ("A" if role_type == 2 else "?")
+            snippet = text.replace("\n", " ")
+            print(f"{shown:>3}. {scores[vec_row]:.3f}  {thread_id} [DB: {db_name}]  {title or '(untitled)'}")
+            print(f"     [{role}] {snippet[:300]}")
+            if shown >= top_k:
+                break
+    finally:
+        catalog.close()
+
+
+# One statement per DB: every bubble with its projected fields, its messageRequestContext paths
+# and the codeBlockDiff rows its diffIds point at (keyed codeBlockDiff:<thread-id>:<diff-id>),
+# ordered by thread then rowid. SQLite's external sorter does the ordering, so rows stream out
+# without Python ever holding more than one shard.
+EXPORT_BUBBLES_SQL = f"""
+    SELECT {BUBBLE_PROJECTION_COLUMNS},
+        (SELECT json_group_array(atom) FROM (
+            SELECT j.atom FROM cursorDiskKV AS ctx,
+                json_tree(CASE WHEN json_valid(CAST(ctx.value AS TEXT)) THEN CAST(ctx.value AS TEXT) ELSE '{{}}' END) AS j
+            WHERE ctx.key = 'messageRequestContext:' || substr(b.key, 10)
+                AND j.type = 'text' AND typeof(j.key) = 'text'
+                AND j.atom LIKE '%/%' AND j.atom GLOB '*Users*'
+            GROUP BY j.atom ORDER BY MIN(j.id)
+        )),
+        (SELECT json_group_array(d.key)
+            FROM json_tree(CASE WHEN json_valid(CAST(b.value AS TEXT)) THEN CAST(b.value AS TEXT) ELSE '{{}}' END) AS j
+            JOIN cursorDiskKV AS d
+                ON d.key = 'codeBlockDiff:' || substr(b.key, 10, instr(substr(b.key, 10), ':') - 1) || ':' || j.atom
+            WHERE j.key = 'diffId')
+    FROM cursorDiskKV AS b WHERE b.key >= 'bubbleId:' AND b.key < 'bubbleId;'
+    ORDER BY substr(b.key, 10, instr(substr(b.key, 10), ':') - 1), b.rowid
+"""
+
+
+def iter_export_records(conn: apsw.Connection) -> Iterable[Dict[str, Any]]:
+    """Yield one flat record per bubble, grouped by thread and in conversation order."""
+    for rowid, key, bubble_type, text, rich_text, raw, paths, diffs in conn.cursor().execute(EXPORT_BUBBLES_SQL):
+        key_str = str(key)
+        bubble_obj = project_bubble_row(bubble_type, text, rich_text, raw)
+        role_type = bubble_obj.get("type")
+        yield {
+            "thread_id": parse_thread_id_from_bubble_key(key_str) or "",
+            "bubble_id": parse_bubble_id_from_bubble_key(key_str) or "",
+            "rowid": int(rowid),
+            "role": "user" if role_type == 1 else ("assistant" if role_type == 2 else None),
+            "text": extract_plain_text_from_bubble(bubble_obj, shorten=False),
+            "context_paths": json.loads(paths) if paths else [],
+            "code_block_diffs": json.loads(diffs) if diffs else [],
+        }
+
+
+def write_export_shard(out_dir: Path, stem: str, shard: int, records: List[Dict[str, Any]], fmt: str) -> Path:
+    if fmt == "parquet":
+        import pandas as pd
+
+        path = out_dir / f"{stem}-{shard:05d}.parquet"
+        pd.DataFrame.from_records(records).to_parquet(path, compression="zstd", index=False)
+    else:
+        path = out_dir / f"{stem}-{shard:05d}.jsonl.gz"
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return path
+
+
+def export_threads(out_dir: Path, fmt: str, shard_rows: int) -> None:
+    """Export every thread of both DBs into `shard_rows`-sized shards; a thread never spans two shards."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
+        try:
+            conn = connect(db_path)
+        except Exception:
+            continue
+        try:
+            if "cursorDiskKV" not in list_tables(conn):
+                continue
+            shard = 0
+            records: List[Dict[str, Any]] = []
+            threads = 0
+            for record in iter_export_records(conn):
+                if not records or record["thread_id"] != records[-1]["thread_id"]:
+                    threads += 1
+                    if len(records) >= shard_rows:
+                        print(f"Wrote {write_export_shard(out_dir, db_path.name, shard, records, fmt)}")
+                        shard += 1
+                        records = []
+                records.append(record)
+            if records:
+                print(f"Wrote {write_export_shard(out_dir, db_path.name, shard, records, fmt)}")
+            print(f"Exported {threads} threads from {db_path.name}")
+        except apsw.SQLError as e:
+            print(f"Failed to export {db_path.name}: {e!r}")
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+HISTORY_DIR_PATH = CURSOR_STORAGE_DIR_PATH.parent / "History"
+BACKUPS_DIR_PATH = CURSOR_STORAGE_DIR_PATH.parent.parent / "Backups"
+DISK_INDEX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS disk_dirs (dir TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS disk_files (
+        dir TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        path TEXT NOT NULL,
+        file TEXT NOT NULL,
+        mtime_ms INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS disk_files_path ON disk_files (path, mtime_ms);
+    CREATE INDEX IF NOT EXISTS disk_files_dir ON disk_files (dir);
+"""
+# Paths mentioned by a thread's code blocks; keys are <family>:<thread-id>:<block-id>.
+CODE_BLOCK_PATHS_SQL = """
+    SELECT DISTINCT j.atom FROM cursorDiskKV AS kv,
+        json_tree(CASE WHEN json_valid(CAST(kv.value AS TEXT)) THEN CAST(kv.value AS TEXT) ELSE '{}' END) AS j
+    WHERE ((kv.key >= 'codeBlockDiff:' || ?1 || ':' AND kv.key < 'codeBlockDiff:' || ?1 || ';')
+        OR (kv.key >= 'codeBlockData:' || ?1 || ':' AND kv.key < 'codeBlockData:' || ?1 || ';'))
+        AND j.type = 'text' AND j.atom LIKE '%/%' AND j.atom GLOB '*Users*'
+"""
+
+
+def uri_to_path(uri: str) -> str:
+    if uri.startswith("file://"):
+        return unquote(urlparse(uri).path)
+    return uri
+
+
+def read_history_dir(session_dir: Path) -> List[Tuple[str, str, str, int, int]]:
+    """Rows for a History/<session> dir: every saved version of the one file its entries.json names."""
+    try:
+        meta = json.loads((session_dir / "entries.json").read_text())
+    except (OSError, ValueError):
+        return []
+    path = uri_to_path(str(meta.get("resource", "")))
+    rows = []
+    for entry in meta.get("entries", []):
+        copy = session_dir / str(entry.get("id", ""))
+        try:
+            st = copy.stat()
+        except OSError:
+            continue
+        rows.append((str(session_dir), "history", path, str(copy), int(entry.get("timestamp") or st.st_mtime_ns // 1_000_000), st.st_size))
+    return rows
+
+
+def read_backup_dir(scheme_dir: Path) -> List[Tuple[str, str, str, int, int]]:
+    """Rows for a Backups/<workspace>/<scheme> dir; each backup's first line starts with its resource URI."""
+    rows = []
+    for entry in os.scandir(scheme_dir):
+        if not entry.is_file():
+            continue
+        try:
+            with open(entry.path, "rb") as f:
+                first_line = f.readline(4096).decode("utf-8", "ignore")
+            st = entry.stat()
+        except OSError:
+            continue
+        uri = first_line.split(" ", 1)[0].strip()
+        if uri:
+            rows.append((str(scheme_dir), "backup", uri_to_path(uri), entry.path, st.st_mtime_ns // 1_000_000, st.st_size))
+    return rows
+
+
+def refresh_disk_index(catalog: apsw.Connection, force: bool = False) -> None:
+    """Index History and Backups copies by original path, re-reading only directories whose mtime changed.
+
+    Adding or replacing a copy bumps the mtime of the directory holding it, so stat-ing those
+    directories (History/<session>, Backups/<workspace>/<scheme>) is enough to find what's new.
+    """
+    catalog.execute(DISK_INDEX_SCHEMA)
+    leaf_dirs: List[Tuple[Path, Any]] = []
+    if HISTORY_DIR_PATH.is_dir():
+        leaf_dirs += [(Path(e.path), read_history_dir) for e in os.scandir(HISTORY_DIR_PATH) if e.is_dir()]
+    if BACKUPS_DIR_PATH.is_dir():
+        for workspace in os.scandir(BACKUPS_DIR_PATH):
+            if workspace.is_dir():
+                leaf_dirs += [(Path(e.path), read_backup_dir) for e in os.scandir(workspace.path) if e.is_dir()]
+    stored = dict(catalog.execute("SELECT dir, mtime_ns FROM disk_dirs"))
+    with catalog:
+        if force:
+            catalog.execute("DELETE FROM disk_files")
+        # `stored` still lists every catalogued dir so a forced reindex prunes removed ones too.
+        unchanged = {} if force else stored
+        seen = set()
+        for leaf_dir, reader in leaf_dirs:
+            key = str(leaf_dir)
+            seen.add(key)
+            mtime_ns = leaf_dir.stat().st_mtime_ns
+            if unchanged.get(key) == mtime_ns:
+                continue
+            catalog.execute("DELETE FROM disk_files WHERE dir = ?", (key,))
+            catalog.executemany("INSERT INTO disk_files VALUES (?, ?, ?, ?, ?, ?)", reader(leaf_dir))
+            catalog.execute("INSERT OR REPLACE INTO disk_dirs VALUES (?, ?)", (key, mtime_ns))
+        for gone in set(stored) - seen:
+            catalog.execute("DELETE FROM disk_files WHERE dir = ?", (gone,))
+            catalog.execute("DELETE FROM disk_dirs WHERE dir = ?", (gone,))
+
+
+def reconstruct_thread(thread_id: str, out_dir: Optional[Path] = None, reindex: bool = False) -> None:
+    """List (and optionally copy to `out_dir`) the on-disk versions of the files a thread touched.
+
+    For every path the thread references, picks the newest History/Backups copy written while
+    the thread was active, falling back to the newest copy overall.
+    """
+    catalog = open_catalog()
+    try:
+        refresh_disk_index(catalog, force=reindex)
+        thread = list(catalog.execute(
+            "SELECT db, created_at, last_updated_at FROM threads WHERE thread_id = ?", (thread_id,)
+        ))
+        if not thread:
+            print(f"Thread ID '{thread_id}' not found in any database.")
+            return
+        db_name, created_at, last_updated_at = thread[0]
+        paths = {path for (path,) in catalog.execute("SELECT path FROM thread_files WHERE thread_id = ?", (thread_id,))}
+        db_path = STATE_SQLITE_PATH if db_name == STATE_SQLITE_PATH.name else STATE_VSCDB_PATH
+        try:
+            conn = connect(db_path)
+            try:
+                paths.update(uri_to_path(str(atom)) for (atom,) in conn.cursor().execute(CODE_BLOCK_PATHS_SQL, (thread_id,)))
+            finally:
+                conn.close()
+        except Exception:
+            pass
+
+        start_ms = created_at or 0
+        # Edits land a little after the last message that asked for them.
+        end_ms = (last_updated_at + 10 * 60 * 1000) if last_updated_at else 2**62
+        produced = 0
+        out_root = out_dir.resolve() if out_dir else None
+        print(f"=== Files from thread {thread_id} [DB: {db_name}] ===\n")
+        for path in sorted(paths):
+            rows = list(catalog.execute(
+                "SELECT kind, file, mtime_ms, size, mtime_ms BETWEEN ? AND ? AS in_window FROM disk_files "
+                "WHERE path = ? ORDER BY in_window DESC, mtime_ms DESC LIMIT 1",
+                (start_ms, end_ms, path),
+            ))
+            if not rows:
+                print(f"- {path}  (no copy on disk)")
+                continue
+            kind, file, mtime_ms, size, in_window = rows[0]
+            produced += 1
+            marker = "" if in_window else "  (outside thread window)"
+            print(f"- {path}\n    {kind}: {file}  {format_timestamp_ms(mtime_ms)}  {format_size(size)}{marker}")
+            if out_root:
+                # Paths come from thread content; don't let `..` or a drive/absolute path escape out_dir.
+                target = (out_root / path.lstrip("/")).resolve()
+                if not target.is_relative_to(out_root):
+                    print(f"    not copied: {path} resolves outside {out_dir}")
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with open(file, "rb") as src, open(target, "wb") as dst:
+                    if kind == "backup":
+                        src.readline()  # URI + metadata header, not file content
+                    shutil.copyfileobj(src, dst)
+        print(f"\n{produced}/{len(paths)} files have a copy on disk" + (f"; copied to {out_dir}" if out_dir and produced else ""))
+    finally:
+        catalog.close()
+
+
+class PayloadMeter:
+    """apsw row tracer that tallies rows and bytes crossing from SQLite into Python."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.bytes = 0
+
+    def __call__(self, cursor: apsw.Cursor, row: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        self.rows += 1
+        for cell in row:
+            if isinstance(cell, (bytes, bytearray)):
+                self.bytes += len(cell)
+            elif isinstance(cell, str):
+                self.bytes += len(cell.encode("utf-8", "ignore"))
+            elif cell is not None:
+                self.bytes += 8
+        return row
+
+
+def measure(conn: apsw.Connection, func: Any) -> Tuple[float, int, int]:
+    """Run `func()` with a PayloadMeter on `conn`; return (seconds, rows, bytes)."""
+    meter = PayloadMeter()
+    conn.row_trace = meter
+    start = time.perf_counter()
+    try:
+        func()
+    finally:
+        conn.row_trace = None
+    return time.perf_counter() - start, meter.rows, meter.bytes
+
+
+def benchmark_projection(keyword: str, max_threads: int, max_bubbles: int) -> None:
+    """Compare full-blob loads against SQL-side JSON projection for thread_explorer and print_thread."""
+    scan_full_sql = "SELECT key, value FROM cursorDiskKV WHERE key LIKE 'bubbleId:%' AND typeof(value) IN ('text','blob') AND value LIKE ? LIMIT 2000"
+    scan_keys_sql = "SELECT key FROM cursorDiskKV WHERE key LIKE 'bubbleId:%' AND typeof(value) IN ('text','blob') AND value LIKE ? LIMIT 2000"
+
+    def render_full(conn: apsw.Connection, thread_ids: List[str]) -> None:
+        for thread_id in thread_ids:
+            for _ in conn.cursor().execute("SELECT value FROM cursorDiskKV WHERE key = ?", (f"composerData:{thread_id}",)):
+                pass
+            for _, bubble_key, bubble_obj in load_thread_bubbles_full(conn, thread_id, max_bubbles):
+                extract_plain_text_from_bubble(bubble_obj)
+                ctx = load_message_request_context(conn, thread_id, parse_bubble_id_from_bubble_key(bubble_key) or "?")
+                if ctx:
+                    extract_paths_from_context(ctx)
+
+    def render_projected(conn: apsw.Connection, thread_ids: List[str]) -> None:
+        for thread_id in thread_ids:
+            for _, bubble_key, bubble_obj in load_thread_bubbles(conn, thread_id, max_bubbles):
+                extract_plain_text_from_bubble(bubble_obj)
+                load_context_paths(conn, thread_id, parse_bubble_id_from_bubble_key(bubble_key) or "?")
+
+    print(f"{'db':<14} {'phase':<14} {'mode':<10} {'rows':>8} {'bytes':>14} {'ms':>10}")
+    for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
+        try:
+            conn = connect(db_path)
+        except Exception:
+            continue
+        try:
+            if "cursorDiskKV" not in list_tables(conn):
+                continue
+            params = (f"%{keyword}%",)
+            hits: Counter = Counter()
+            for (key,) in conn.cursor().execute(scan_keys_sql, params):
+                thread_id = parse_thread_id_from_bubble_key(str(key))
+                if thread_id:
+                    hits[thread_id] += 1
+            thread_ids = [thread_id for thread_id, _ in hits.most_common(max_threads)]
+            phases = [
+                ("explorer scan", "full", lambda: list(conn.cursor().execute(scan_full_sql, params))),
+                ("explorer scan", "projected", lambda: list(conn.cursor().execute(scan_keys_sql, params))),
+                ("thread render", "full", lambda: render_full(conn, thread_ids)),
+                ("thread render", "projected", lambda: render_projected(conn, thread_ids)),
+            ]
+            for phase, mode, func in phases:
+                seconds, rows, nbytes = measure(conn, func)
+                print(f"{db_path.name:<14} {phase:<14} {mode:<10} {rows:>8,} {nbytes:>14,} {seconds * 1000:>10.1f}")
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+FIXTURE_WORDS = (
+    "the a to of and in for is it that with on this we can should use add fix test file function "
+    "class import return error value type async await request response cache index query thread "
+    "config build deploy refactor parser database schema migration traceback exception asyncio "
+    "pytest fixture docker kubernetes rust python typescript react component hook state render"
+).split()
+FIXTURE_TRACEBACK = (
+    "Traceback (most recent call last):\n"
+    '  File "/Users/dev/src/app/main.py", line 42, in <module>\n'
+    "    asyncio.run(main())\n"
+    "RuntimeError: Event loop is closed"
+)
+
+
+def fixture_text(rng: random.Random, min_words: int, max_words: int) -> str:
+    text = " ".join(rng.choices(FIXTURE_WORDS, k=rng.randint(min_words, max_words)))
+    if rng.random() < 0.05:
+        text += "\n\n" + FIXTURE_TRACEBACK
+    if rng.random() < 0.2:
+        text += "\n\n```python\n" + "\n".join(f"def {w}_{i}():\n    return {i}" for i, w in enumerate(rng.choices(FIXTURE_WORDS, k=8))) + "\n```"
+    return text
+
+
+def iter_fixture_rows(rng: random.Random, rows: int) -> Iterable[Tuple[str, str]]:
+    """cursorDiskKV rows shaped like Cursor's: per thread a composerData, bubbles with their
+    messageRequestContext, and codeBlockDiff rows referenced from assistant bubbles' diffIds."""
+    emitted = 0
+    start_ms = 1_700_000_000_000
+    thread_no = 0
+    while emitted < rows:
+        thread_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        created_at = start_ms + thread_no * 3_600_000
+        headers = []
+        for turn in range(rng.randint(2, 40)):
+            bubble_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            role = 1 if turn % 2 == 0 else 2
+            text = fixture_text(rng, 5, 60) if role == 1 else fixture_text(rng, 40, 600)
+            bubble: Dict[str, Any] = {
+                "_v": 3,
+                "type": role,
+                "bubbleId": bubble_id,
+                "text": text,
+                "richText": json.dumps({"root": {"children": [{"children": [{"text": text, "type": "text"}], "type": "paragraph"}]}}),
+                "createdAt": created_at + turn * 60_000,
+            }
+            if role == 2 and rng.random() < 0.3:
+                diff_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+                bubble["codeBlocks"] = [{"diffId": diff_id, "uri": {"fsPath": f"/Users/dev/src/app/{rng.choice(FIXTURE_WORDS)}.py"}}]
+                yield f"codeBlockDiff:{thread_id}:{diff_id}", json.dumps({
+                    "uri": {"fsPath": bubble["codeBlocks"][0]["uri"]["fsPath"]},
+                    "newModelDiffWrtV0": [{"original": {"startLineNumber": 1}, "modified": fixture_text(rng, 10, 80).split()}],
+                })
+                emitted += 1
+            yield f"bubbleId:{thread_id}:{bubble_id}", json.dumps(bubble)
+            paths = [f"/Users/dev/src/app/{w}.py" for w in rng.sample(FIXTURE_WORDS, rng.randint(0, 4))]
+            yield f"messageRequestContext:{thread_id}:{bubble_id}", json.dumps({
+                "visibleFiles": [{"relativePath": p, "uri": {"fsPath": p}} for p in paths],
+                "selections": [],
+            })
+            headers.append({"bubbleId": bubble_id, "type": role})
+            emitted += 2
+        yield f"composerData:{thread_id}", json.dumps({
+            "_v": 3,
+            "composerId": thread_id,
+            "name": " ".join(rng.choices(FIXTURE_WORDS, k=rng.randint(2, 6))).capitalize(),
+            "createdAt": created_at,
+            "lastUpdatedAt": created_at + len(headers) * 60_000,
+            "status": "completed",
+            "fullConversationHeadersOnly": headers,
+        })
+        emitted += 1
+        thread_no += 1
+
+
+def make_fixture(out_dir: Path, rows: int, seed: int = 0) -> None:
+    """Write a synthetic state.vscdb (~`rows` cursorDiskKV rows) and a near-empty state.sqlite into `out_dir`."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    for name in ("state.vscdb", "state.sqlite"):
+        path = out_dir / name
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(path) + suffix).unlink(missing_ok=True)
+        conn = apsw.Connection(str(path))
+        conn.execute("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF")
+        # Same DDL Cursor uses.
+        conn.execute(
+            "CREATE TABLE ItemTable (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB);"
+            "CREATE TABLE cursorDiskKV (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB);"
+        )
+        if name == "state.vscdb":
+            start = time.perf_counter()
+            with conn:
+                conn.executemany("INSERT INTO cursorDiskKV VALUES (?, ?)", iter_fixture_rows(rng, rows))
+                conn.executemany("INSERT INTO ItemTable VALUES (?, ?)", [
+                    ("workbench.panel.aichat.view.aichat.chatdata", json.dumps({
+                        "tabs": [{"tabId": str(i), "chatTitle": fixture_text(rng, 2, 6), "title": fixture_text(rng, 2, 6)} for i in range(50)]
+                    })),
+                    ("cursorai/serverConfig", json.dumps({"models": FIXTURE_WORDS[:10]})),
+                ])
+            (count,) = next(conn.execute("SELECT COUNT(*) FROM cursorDiskKV"))
+            print(f"Wrote {count:,} cursorDiskKV rows to {path} ({format_size(path.stat().st_size)}) in {time.perf_counter() - start:.1f}s")
+        conn.close()
+
+
+def benchmark_suite(query: str, repeat: int, warm_cache: bool = False) -> None:
+    """Time keyword search, thread explorer, thread render and snippets against the configured DBs.
+
+    Runs with the result cache off (cold scans) unless `warm_cache` is set, in which case every
+    run after the first times a cache hit; output of the timed calls is discarded.
+    """
+    global use_result_cache
+    saved_use_result_cache = use_result_cache
+    use_result_cache = use_result_cache and warm_cache
+    try:
+        run_benchmark_suite(query, repeat)
+    finally:
+        use_result_cache = saved_use_result_cache
+
+
+def run_benchmark_suite(query: str, repeat: int) -> None:
+    catalog = open_catalog()
+    try:
+        sample = list(catalog.execute("SELECT thread_id FROM threads ORDER BY bubble_count DESC LIMIT 1"))
+        (rows,) = next(catalog.execute("SELECT COALESCE(SUM(bubble_count), 0) FROM threads"))
+    finally:
+        catalog.close()
+    thread_id = sample[0][0] if sample else ""
+    cases = [
+        ("keyword search", lambda: print_results(collect_matches(query, 500, 50))),
+        ("thread explorer", lambda: thread_explorer(query, 3, 200)),
+        ("thread render", lambda: print_thread_by_id(thread_id)),
+        ("snippets", lambda: print_search_hits(scan_snippet_hits(query, 500, 50)[:100])),
+        ("snippets (full text)", lambda: print_search_hits(scan_snippet_hits(query, 500, 50)[:100], shorten=False)),
+    ]
+    print(f"{STATE_VSCDB_PATH} — {rows:,} bubbles, query {query!r}, {repeat} runs, result cache {'on' if use_result_cache else 'off'}\n")
+    print(f"{'case':<22} {'min ms':>10} {'median ms':>10} {'max ms':>10}")
+    for name, func in cases:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{name:<22} {timings[0]:>10.1f} {timings[len(timings) // 2]:>10.1f} {timings[-1]:>10.1f}")
+
+
+SERVE_SOCKET_PATH = CACHE_ROOT_PATH / "serve.sock"
+
+
+class CapturedOutput(io.StringIO):
+    """stdout for one served request; reports the client's terminal so highlighting matches a local run."""
+
+    def __init__(self, tty: bool) -> None:
+        super().__init__()
+        self.tty = tty
+
+    def isatty(self) -> bool:
+        return self.tty
+
+
+class ServeHandler(socketserver.StreamRequestHandler):
+    """One JSON object per line in, one per line out.
+
+    Request:  {"argv": ["traceback", "--snippets"], "tty": false}
+    Response: {"ok": true, "exit": 0, "output": "...", "elapsed_ms": 3.1}
+    """
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            start = time.perf_counter()
+            try:
+                request = json.loads(line)
+                argv = [str(arg) for arg in request["argv"]]
+                tty = bool(request.get("tty", False))
+            except (ValueError, KeyError, TypeError) as e:
+                response: Dict[str, Any] = {"ok": False, "exit": 2, "output": "", "error": f"bad request: {e}"}
+            else:
+                response = run_served_command(argv, tty)
+            response["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+# Options of the --serve command line that served requests inherit unless they pass their own.
+SERVED_OPTIONS = ("storage_dir", "snapshot", "no_cache")
+served_defaults: Dict[str, Any] = {}
+
+
+def run_served_command(argv: List[str], tty: bool) -> Dict[str, Any]:
+    """Run main(argv) in-process with stdout/stderr captured, on top of the server's SERVED_OPTIONS."""
+    stdout = CapturedOutput(tty)
+    stderr = io.StringIO()
+    exit_code = 0
+    error = None
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            main(argv)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            exit_code = 1
+            error = f"{type(e).__name__}: {e}"
+    response: Dict[str, Any] = {"ok": exit_code == 0, "exit": exit_code, "output": stdout.getvalue()}
+    if stderr.getvalue():
+        response["stderr"] = stderr.getvalue()
+    if error:
+        response["error"] = error
+    return response
+
+
+def serve(socket_path: Path) -> None:
+    """Answer CLI invocations over a Unix socket, keeping DB connections, the catalog and caches warm.
+
+    Requests are handled one at a time: the CLI's settings are module globals, and SQLite reads
+    here are short enough that queueing costs less than a connection per thread.
+    """
+    global warm_connections
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            socket_path.unlink()
+        else:
+            probe.close()
+            print(f"A server is already listening on {socket_path}", file=sys.stderr)
+            sys.exit(1)
+    warm_connections = {}
+    # Warm up: opens both DBs and brings the catalog up to date before the first request.
+    open_catalog().close()
+    for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
+        try:
+            list_tables(connect(db_path))
+        except apsw.Error:
+            pass
+    server = socketserver.UnixStreamServer(str(socket_path), ServeHandler)
+    # Let `kill` take the same cleanup path as Ctrl-C so the socket file doesn't linger.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving on {socket_path} (Ctrl-C to stop)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+        for conn in warm_connections.values():
+            conn.really_close()
+        warm_connections = None
+
+
+def run_client(socket_path: Path, argv: List[str]) -> int:
+    """Forward `argv` to a --serve process and print its output; returns the remote exit code."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(socket_path))
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"No server on {socket_path}; start one with --serve", file=sys.stderr)
+        return 1
+    with client, client.makefile("rwb") as stream:
+        stream.write(json.dumps({"argv": argv, "tty": sys.stdout.isatty()}).encode("utf-8") + b"\n")
+        stream.flush()
+        response = json.loads(stream.readline())
+    sys.stdout.write(response.get("output", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    if response.get("error"):
+        print(response["error"], file=sys.stderr)
+    return response.get("exit", 1)
+
+
+STARTUP_HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "fastembed")
+STARTUP_BUDGET_MS = 150.0
+
+
+def import_times(argv: List[str]) -> Tuple[float, Dict[str, float]]:
+    """Run this script with `-X importtime` and return (wall ms, {top-level module: cumulative ms}).
+
+    Only imports after `site` count: what the interpreter and environment load before the script
+    runs isn't ours to slim down.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(Path(__file__).resolve()), *argv],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    modules: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        if name.strip() == "site" and not name[1:].startswith(" "):
+            modules.clear()
+        elif not name[1:].startswith(" "):
+            modules[name.strip()] = int(cumulative) / 1000
+    return wall_ms, modules
+
+
+def benchmark_startup(query: str, budget_ms: float, storage_dir: Path) -> None:
+    """Import-time check for the common commands; exits non-zero when heavy modules or the budget creep in."""
+    commands = [
+        ["--help"],
+        [query, "--limit", "1", "--no-cache"],
+        [query, "--explore", "--max-threads", "1", "--no-cache"],
+        ["--list", "--page-size", "1"],
+    ]
+    failures: List[str] = []
+    for argv in commands:
+        argv = [*argv, "--storage-dir", str(storage_dir)]
+        wall_ms, modules = import_times(argv)
+        imports_ms = sum(modules.values())
+        print(f"{' '.join(argv)}\n  wall {wall_ms:.1f} ms, imports {imports_ms:.1f} ms")
+        for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:5]:
+            print(f"    {ms:8.1f} ms  {name}")
+        heavy = sorted(name for name in modules if name.split(".")[0] in STARTUP_HEAVY_MODULES)
+        if heavy:
+            failures.append(f"{argv[0]}: imports {', '.join(heavy)}")
+        if imports_ms > budget_ms:
+            failures.append(f"{argv[0]}: imports took {imports_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    if failures:
+        print("\nStartup regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nStartup OK")
+
+
+def is_thread_id(query: str) -> bool:
+    """Check if query looks like a thread ID (UUID format)."""
+    pattern = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+    return bool(re.match(pattern, query, re.IGNORECASE))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Search Cursor state DBs for conversations by keyword or print a specific thread by ID",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "query",
+        nargs="?",
+        help=(
+            "Thread ID (UUID format) to print in full, or a search query: words and \"phrases\" are SQLite LIKE "
+            "fragments (case-insensitive for ASCII), /regex/ or /regex/i are Python regexes; combine with "
+            "AND (implicit), OR, NOT and parentheses"
+        ),
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=500,
+        help="Max matches to pull from ItemTable per DB",
+    )
+    parser.add_argument(
+        "--per-table-limit",
+        type=int,
+        default=50,
+        help="Max rows to pull per generic table",
     )
     parser.add_argument(
         "--debug", action="store_true", help="Print schema info while scanning"
@@ -526,7 +2488,233 @@ def main() -> None:
         action="store_true",
         help="Don't shorten/truncate message text",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Benchmark full-blob loads vs SQL-side JSON projection for the keyword's threads, then exit",
+    )
+    parser.add_argument(
+        "--storage-dir",
+        type=Path,
+        default=default_storage_dir(),
+        help="Directory holding state.vscdb/state.sqlite (default: $CURSOR_STORAGE_DIR or Cursor's globalStorage)",
+    )
+    parser.add_argument(
+        "--make-fixture",
+        metavar="DIR",
+        type=Path,
+        help="Write synthetic Cursor DBs to DIR (use with --storage-dir DIR afterwards), then exit",
+    )
+    parser.add_argument(
+        "--fixture-rows",
+        type=int,
+        default=10_000,
+        help="Approximate cursorDiskKV rows for --make-fixture (10k-10M are reasonable)",
+    )
+    parser.add_argument(
+        "--bench-suite",
+        action="store_true",
+        help="Time keyword search, explorer, thread render and snippet modes (query defaults to 'traceback'), then exit",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Runs per --bench-suite case",
+    )
+    parser.add_argument(
+        "--bench-warm",
+        action="store_true",
+        help="Leave the result cache on for --bench-suite, so repeats time cache hits instead of scans",
+    )
+    parser.add_argument(
+        "--bench-startup",
+        action="store_true",
+        help="Check -X importtime of the common commands: fail if numpy/pandas/pyarrow load or imports exceed --startup-budget-ms",
+    )
+    parser.add_argument(
+        "--startup-budget-ms",
+        type=float,
+        default=STARTUP_BUDGET_MS,
+        help="Import-time budget per command for --bench-startup",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Keep DB connections, the catalog and caches warm and answer --client requests on --socket",
+    )
+    parser.add_argument(
+        "--client",
+        action="store_true",
+        help="Send the rest of the command line to a running --serve process instead of running it here",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=SERVE_SOCKET_PATH,
+        help="Unix socket for --serve/--client (JSON lines: {\"argv\": [...]} -> {\"output\": ...})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always rescan instead of reusing results cached for the DBs' current state",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Query private copies of the DBs (refreshed only when Cursor has written) instead of the live files",
+    )
+    parser.add_argument(
+        "--semantic",
+        action="store_true",
+        help="Rank message chunks by embedding similarity to the query instead of keyword matching",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=10,
+        help="Number of --semantic results",
+    )
+    parser.add_argument(
+        "--reconstruct",
+        action="store_true",
+        help="With a thread ID: list the History/Backups copies of the files the thread touched",
+    )
+    parser.add_argument(
+        "--out",
+        metavar="DIR",
+        type=Path,
+        help="Copy the files found by --reconstruct into DIR, mirroring their original paths",
+    )
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="Rebuild the History/Backups index used by --reconstruct from scratch",
+    )
+    parser.add_argument(
+        "--export",
+        metavar="DIR",
+        type=Path,
+        help="Export every thread to compressed shards in DIR (query not needed)",
+    )
+    parser.add_argument(
+        "--export-format",
+        choices=("jsonl", "parquet"),
+        default="jsonl",
+        help="Shard format of --export",
+    )
+    parser.add_argument(
+        "--shard-rows",
+        type=int,
+        default=50_000,
+        help="Approximate messages per --export shard",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="Page through the thread catalog instead of searching (query not needed)",
+    )
+    parser.add_argument(
+        "--sort",
+        choices=("recent", "size"),
+        default="recent",
+        help="Order of --list",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print usage statistics: activity per day/month, thread lengths, assistant/user ratio, top files, repos and title words",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=15,
+        help="Rows per --stats section",
+    )
+    parser.add_argument(
+        "--page",
+        type=int,
+        default=1,
+        help="Page of --list to print",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=50,
+        help="Threads per --list page",
+    )
+    global use_snapshots, use_result_cache, served_defaults
+    args = parser.parse_args(argv, namespace=argparse.Namespace(**served_defaults))
+    if warm_connections is not None and (args.serve or args.client):
+        # Checked on the parsed args so abbreviations (--serv, --cli) are caught too: a served
+        # --client would connect back to this single-threaded server and hang it.
+        parser.error("--serve/--client can't be forwarded to a running server")
+    if args.client:
+        # Let argparse find --client/--socket (abbreviated or not) and forward everything else.
+        client_parser = argparse.ArgumentParser(add_help=False)
+        client_parser.add_argument("--client", action="store_true")
+        client_parser.add_argument("--socket", type=Path)
+        _, forwarded = client_parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+        sys.exit(run_client(args.socket, forwarded))
+    if args.serve:
+        use_snapshots = args.snapshot
+        use_result_cache = not args.no_cache
+        set_storage_dir(args.storage_dir)
+        served_defaults = {name: getattr(args, name) for name in SERVED_OPTIONS}
+        try:
+            serve(args.socket)
+        finally:
+            served_defaults = {}
+        return
+    if args.query and not args.semantic and not is_thread_id(args.query):
+        try:
+            parse_query(args.query)
+        except ValueError as e:
+            parser.error(str(e))
+    if not (args.list or args.stats or args.export or args.make_fixture or args.bench_suite or args.bench_startup or args.query):
+        parser.error("query is required unless --list, --stats, --export, --make-fixture, --bench-suite or --bench-startup is given")
+
+    use_snapshots = args.snapshot
+    use_result_cache = not args.no_cache
+    set_storage_dir(args.storage_dir)
+
+    if args.make_fixture:
+        make_fixture(args.make_fixture, max(args.fixture_rows, 1))
+        return
+
+    if args.bench_startup:
+        benchmark_startup(args.query or "traceback", args.startup_budget_ms, args.storage_dir)
+        return
+
+    if args.bench_suite:
+        benchmark_suite(args.query or "traceback", max(args.repeat, 1), warm_cache=args.bench_warm)
+        return
+
+    if args.export:
+        export_threads(args.export, args.export_format, max(args.shard_rows, 1))
+        return
+
+    if args.stats:
+        print_stats(max(args.top, 1))
+        return
+
+    if args.list:
+        print_thread_list(args.sort, max(args.page, 1), max(args.page_size, 1))
+        return
+
+    if args.semantic:
+        semantic_search(args.query, max(args.top_k, 1))
+        return
+
+    if args.bench:
+        benchmark_projection(args.query, args.max_threads, args.max_bubbles)
+        return
+
+    if args.reconstruct:
+        if not is_thread_id(args.query):
+            parser.error("--reconstruct needs a thread ID")
+        reconstruct_thread(args.query, args.out, reindex=args.reindex)
+        return
 
     # Check if query is a thread ID first
     if is_thread_id(args.query):
@@ -544,163 +2732,9 @@ def main() -> None:
             return
 
     # Snippet fallback or explicit request
-    def extract_text_from_json(obj: Any, max_texts: int = 5) -> List[str]:
-        """Recursively extract human-readable text from JSON structure."""
-        texts: List[str] = []
-        
-        def walk(o: Any, depth: int = 0) -> None:
-            if depth > 5 or len(texts) >= max_texts:
-                return
-            
-            if isinstance(o, dict):
-                # Special handling for known structures
-                if "text" in o and isinstance(o["text"], str) and o["text"].strip():
-                    texts.append(o["text"].strip())
-                    return
-                if "richText" in o and isinstance(o["richText"], str):
-                    # richText might be JSON itself
-                    try:
-                        rich = json.loads(o["richText"])
-                        walk(rich, depth + 1)
-                    except:
-                        pass
-                
-                # Look for text-like fields
-                for key, val in o.items():
-                    if key in {"_v", "type", "id", "fsPath", "external", "$mid", "diffId", "uri"}:
-                        continue  # Skip technical metadata
-                    if isinstance(val, str) and len(val) > 10 and len(val) < 500:
-                        # Potential human text (not too short, not too long)
-                        if not val.startswith("{") and not val.startswith("["):
-                            texts.append(val.strip())
-                    else:
-                        walk(val, depth + 1)
-            
-            elif isinstance(o, list):
-                for item in o:
-                    walk(item, depth + 1)
-        
-        walk(obj)
-        return texts
-    
-    def format_snippet(key: str, raw_text: str, shorten: bool = True) -> str:
-        """Format a snippet by extracting meaningful text from JSON."""
-        # Try to parse as JSON
-        try:
-            data = json.loads(raw_text)
-            
-            # For bubbleId entries, use specialized extraction
-            if key.startswith("bubbleId:"):
-                text = extract_plain_text_from_bubble(data, shorten=shorten)
-                if text:
-                    if shorten:
-                        text = text.replace("\n", " ").strip()
-                        return (text[:300] + "…") if len(text) > 300 else text
-                    else:
-                        return text
-                else:
-                    return "(no text in bubble)"
-            
-            # For all other JSON, extract text generically
-            texts = extract_text_from_json(data, max_texts=3)
-            if texts:
-                combined = " | ".join(texts[:3])
-                if shorten:
-                    combined = combined.replace("\n", " ").strip()
-                    return (combined[:300] + "…") if len(combined) > 300 else combined
-                else:
-                    return combined
-            else:
-                # No text found, show JSON structure hint
-                return f"(JSON: {list(data.keys())[:5] if isinstance(data, dict) else 'array'})"
-        
-        except (json.JSONDecodeError, Exception):
-            pass
-        
-        # Not JSON or parsing failed - show as-is
-        s = raw_text.replace("\n", " ").strip()
-        if shorten:
-            return (s[:160] + "…") if len(s) > 160 else s
-        else:
-            return s
-
     print("\nMatching snippets:\n")
-    total_shown = 0
-    shorten_snippets = not args.no_shorten
-    for db_path in (STATE_SQLITE_PATH, STATE_VSCDB_PATH):
-        try:
-            conn = apsw.Connection(str(db_path))
-        except Exception:
-            continue
-        cur = conn.cursor()
-        try:
-            # ItemTable
-            if "ItemTable" in list_tables(conn):
-                try:
-                    for key, value in cur.execute(
-                        "SELECT key, value FROM ItemTable WHERE typeof(value) IN ('text','blob') AND value LIKE ? LIMIT ?",
-                        (f"%{args.query}%", min(100, args.limit)),
-                    ):
-                        text = (
-                            value.decode("utf-8", "ignore")
-                            if isinstance(value, (bytes, bytearray))
-                            else str(value)
-                        )
-                        formatted = format_snippet(str(key), text, shorten_snippets)
-                        print(f"- [{db_path.name}] ItemTable key={key}: {formatted}")
-                        total_shown += 1
-                        if total_shown >= 100:
-                            return
-                except apsw.SQLError:
-                    pass
-            # cursorDiskKV
-            tables = set(list_tables(conn))
-            if "cursorDiskKV" in tables:
-                try:
-                    for key, value in cur.execute(
-                        "SELECT key, value FROM cursorDiskKV WHERE typeof(value) IN ('text','blob') AND value LIKE ? LIMIT ?",
-                        (f"%{args.query}%", min(100, args.per_table_limit)),
-                    ):
-                        text = (
-                            value.decode("utf-8", "ignore")
-                            if isinstance(value, (bytes, bytearray))
-                            else str(value)
-                        )
-                        formatted = format_snippet(str(key), text, shorten_snippets)
-                        print(f"- [{db_path.name}] cursorDiskKV key={key}: {formatted}")
-                        total_shown += 1
-                        if total_shown >= 100:
-                            return
-                except apsw.SQLError:
-                    pass
-            # Generic tables text columns
-            for table in tables:
-                if table in {"ItemTable", "cursorDiskKV"}:
-                    continue
-                cols = table_columns(conn, table)
-                text_cols = [c for c, t in cols if is_text_affinity(t)]
-                for col in text_cols[:2]:
-                    try:
-                        query = f"SELECT {col} FROM {table} WHERE typeof({col}) IN ('text','blob') AND {col} LIKE ? LIMIT ?"
-                        for (value,) in cur.execute(query, (f"%{args.query}%", 5)):
-                            text = (
-                                value.decode("utf-8", "ignore")
-                                if isinstance(value, (bytes, bytearray))
-                                else str(value)
-                            )
-                            # Use empty key for generic table entries
-                            formatted = format_snippet("", text, shorten_snippets)
-                            print(f"- [{db_path.name}] {table}.{col}: {formatted}")
-                            total_shown += 1
-                            if total_shown >= 100:
-                                return
-                    except apsw.SQLError:
-                        continue
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
+    hits = scan_snippet_hits(args.query, args.limit, args.per_table_limit)
+    print_search_hits(hits[:100], shorten=not args.no_shorten)
 
 
 if __name__ == "__main__":
@@ -1,36 +1,156 @@
 #!/usr/bin/env python3.12
+import asyncio
+import base64
 import builtins
+import contextlib
+import functools
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import sqlite3
+import threading
+import time
 from datetime import datetime as dt
+from functools import cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 # from dateutil.parser import parse as parsedate
 import click
-import requests
+import httpx
 from rich import print
-from functools import cache
-
-import os
-import json
-import hashlib
-import functools
-
 
 # https://techgaun.github.io/active-forks/index.html
 
 
 @click.command()
-@click.argument("repo")
-def main(repo):
+@click.argument("repo", required=False)
+@click.option(
+    "--concurrency",
+    default=8,
+    show_default=True,
+    help="Max GitHub requests in flight at once.",
+)
+@click.option(
+    "--llm-concurrency",
+    default=4,
+    show_default=True,
+    help="Max README summaries being generated at once.",
+)
+@click.option(
+    "--llm",
+    type=click.Choice(["openai", "stub"]),
+    default="openai",
+    show_default=True,
+    help="Summary backend; 'stub' answers locally (first sentence of the README) for offline runs and benchmarks.",
+)
+@click.option(
+    "--rest",
+    is_flag=True,
+    help="Use only the REST API (by default GraphQL fetches 100 forks per query, falling back to REST on errors).",
+)
+@click.option(
+    "--compare",
+    is_flag=True,
+    help="Classify forks by the compare API (commits ahead/behind, changed files), most-starred first, instead of push dates.",
+)
+@click.option(
+    "--no-http-cache",
+    is_flag=True,
+    help="Don't read or write the ETag cache of GitHub responses (~/.cache/land/getforks-http.db).",
+)
+@click.option(
+    "--record",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Save every GitHub response and completion to this fixtures directory.",
+)
+@click.option(
+    "--replay",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Serve GitHub responses and completions from a --record fixtures directory; no network or tokens needed.",
+)
+@click.option(
+    "--latency-ms",
+    default=50,
+    show_default=True,
+    help="Simulated per-request latency for --replay and --bench.",
+)
+@click.option(
+    "--bench",
+    is_flag=True,
+    help="Time end-to-end runs (GraphQL and REST, stub LLM) against a local stand-in GitHub; REPO is not needed.",
+)
+@click.option(
+    "--bench-sizes",
+    default="10,100,1000,10000",
+    show_default=True,
+    help="Fork counts of the --bench repos.",
+)
+def main(
+    repo, concurrency, llm_concurrency, llm, rest, compare, no_http_cache, record, replay, latency_ms, bench, bench_sizes
+):
+    global use_http_cache, llm_backend, fixtures_mode, fixtures_dir, replay_latency_seconds
+    use_http_cache = not no_http_cache
+    llm_backend = llm
+    if bench:
+        benchmark([int(size) for size in bench_sizes.split(",")], latency_ms / 1000, concurrency, llm_concurrency)
+        return
+    if not repo:
+        raise click.UsageError("REPO is required unless --bench is given")
+    if record or replay:
+        # Conditional requests would make recordings depend on the cache's state.
+        use_http_cache = False
+        fixtures_mode, fixtures_dir = ("replay", replay) if replay else ("record", record)
+        replay_latency_seconds = latency_ms / 1000
     repo = repo.removeprefix("https://").removeprefix("www.").removeprefix("github.com/")
-    repodata = parse_fork_dates(github_api_get("repos/" + repo).json())
-    commits_num = len(github_api_get(f"repos/{repo}/commits").json())
-    branches_num = len(github_api_get(f"repos/{repo}/branches").json())
-    forks = github_api_get(
-        f"repos/{repo}/forks", params={"sort": "stargazers", "per_page": 100}
-    ).json()
-    ahead_forks, even_forks, behind_forks, longest_full_name_length = (
-        group_forks_by_ahead_even_behind(forks, repodata)
-    )
+    rate_limiter().set_concurrency(concurrency)
+    asyncio.run(amain(repo, use_graphql=not rest, compare=compare, llm_concurrency=llm_concurrency))
+
+
+async def amain(repo, *, use_graphql=True, compare=False, llm_concurrency=4):
+    try:
+        fetched = None
+        if use_graphql:
+            try:
+                fetched = await fetch_repo_graphql(repo)
+            except GraphQLError as e:
+                print(f"[dim]GraphQL failed ({e}); falling back to REST")
+        repodata, commits_num, branches_num, fork_pages = fetched or await fetch_repo_rest(repo)
+        ahead_forks, even_forks, behind_forks = [], [], []
+        longest_full_name_length = 0
+
+        def add_to_groups(forks):
+            nonlocal longest_full_name_length
+            ahead, even, behind, longest = group_forks_by_ahead_even_behind(forks, repodata)
+            ahead_forks.extend(ahead)
+            even_forks.extend(even)
+            behind_forks.extend(behind)
+            longest_full_name_length = max(longest_full_name_length, longest)
+
+        # Forks are grouped as their pages arrive (with --compare, once the page's comparisons are in),
+        # and READMEs of forks without a description start downloading right away; the rate limiter
+        # bounds how many requests run at once and serves the most-starred forks first.
+        all_forks = []
+        readme_tasks = {}
+        compare_tasks = []
+        async for forks in fork_pages:
+            all_forks += forks
+            for fork in forks:
+                if not fork["description"]:
+                    readme_tasks[fork["full_name"]] = asyncio.create_task(fetch_readme(fork))
+            if compare:
+                compare_tasks.append(asyncio.create_task(compare_forks(repo, repodata, forks)))
+            else:
+                add_to_groups(forks)
+        for compared in asyncio.as_completed(compare_tasks):
+            add_to_groups(await compared)
+        descriptions = {fork["full_name"]: fork["description"] for fork in all_forks if fork["description"]}
+        descriptions |= await summarize_readmes(all_forks, readme_tasks, llm_concurrency)
+    finally:
+        await github_client().aclose()
+        save_compare_cache()
     print_original_repo_stats(branches_num, commits_num, repo, repodata)
     # print(repodata)
     # breakpoint()
@@ -41,12 +161,12 @@ def main(repo):
         print(
             f"[on rgb(0,40,0)][rgb(0,215,0)]{pformat_fork(fork, longest_full_name_length)}"
         )
-        print(get_fork_description(fork), end="\n\n")
+        print(descriptions[fork["full_name"]], end="\n\n")
 
     print(f"[bright_white bold]even_forks: {len(even_forks)}")
     for fork in sorted(even_forks, key=lambda _f: _f["stargazers_count"], reverse=True):
         print(pformat_fork(fork, longest_full_name_length))
-        print(get_fork_description(fork), end="\n\n")
+        print(descriptions[fork["full_name"]], end="\n\n")
 
     print(f"[bright_yellow bold]behind_forks: {len(behind_forks)}")
     for fork in sorted(
@@ -55,38 +175,68 @@ def main(repo):
         print(
             f"[on rgb(40,40,0)][rgb(215,215,0)]{pformat_fork(fork, longest_full_name_length)}"
         )
-        print(get_fork_description(fork), end="\n\n")
+        print(descriptions[fork["full_name"]], end="\n\n")
+
+
+COMPLETION_CACHE_PATH = Path.home() / ".cache/land/getforks-completions.db"
+COMPLETION_CACHE_TTL_SECONDS = 90 * 24 * 3600
+COMPLETION_CACHE_MAX_ENTRIES = 20_000
 
 
 def disk_cache(func):
-    cache_dir = (Path.home() / ".cache/land")
-    os.makedirs(cache_dir, exist_ok=True)
-    cache_path = os.path.join(cache_dir, "getforks.json")
+    """Cache `func(**kwargs)` in SQLite, keyed by every request field that affects the answer.
 
-    @functools.wraps(func)
-    def wrapper(**kwargs):
-        messages = kwargs["messages"]
-        user_message: str = messages[1]["content"]
-        # key = json.dumps({"kwargs": kwargs}, sort_keys=True)
-        key = user_message
-        hash_key = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    Each hit or write touches one row (WAL mode, so concurrent runs and the summary worker
+    threads don't block or clobber each other). Entries expire after
+    COMPLETION_CACHE_TTL_SECONDS, and past COMPLETION_CACHE_MAX_ENTRIES the least recently
+    used go first.
+    """
+    local = threading.local()
 
-        try:
-            with open(cache_path, "r") as f:
-                cache = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            cache = {}
+    def connection():
+        # One connection per thread: summaries run in asyncio.to_thread workers.
+        if not hasattr(local, "db"):
+            COMPLETION_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            local.db = sqlite3.connect(COMPLETION_CACHE_PATH, isolation_level=None, timeout=10)
+            local.db.execute("PRAGMA journal_mode=WAL")
+            local.db.execute(
+                "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            local.db.execute("CREATE INDEX IF NOT EXISTS completions_lru ON completions (last_used)")
+        return local.db
 
-        if hash_key in cache:
-            return cache[hash_key]
+    @functools.wraps(func)
+    def wrapper(**kwargs):
+        # `stream` changes the transport, not the answer.
+        request = {k: v for k, v in kwargs.items() if k != "stream"}
+        hash_key = hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+        db = connection()
+        now = time.time()
+        row = db.execute(
+            "SELECT value FROM completions WHERE key = ? AND created_at > ?",
+            (hash_key, now - COMPLETION_CACHE_TTL_SECONDS),
+        ).fetchone()
+        if row:
+            db.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, hash_key))
+            return json.loads(row[0])
 
         # Call the function and store the result in cache
         result = func(**kwargs)
-        cache[hash_key] = result
         try:
-            with open(cache_path, "w") as f:
-                json.dump(cache, f, indent=4)
-        except Exception as e:
+            with db:
+                db.execute("BEGIN")
+                db.execute(
+                    "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                    (hash_key, json.dumps(result), now, now),
+                )
+                db.execute("DELETE FROM completions WHERE created_at <= ?", (now - COMPLETION_CACHE_TTL_SECONDS,))
+                db.execute(
+                    "DELETE FROM completions WHERE key IN "
+                    "(SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (COMPLETION_CACHE_MAX_ENTRIES,),
+                )
+        except sqlite3.Error as e:
             print(f"Failed to write cache: {e!r}")
 
         return result
@@ -99,10 +249,18 @@ def group_forks_by_ahead_even_behind(forks, repodata):
     even_forks = []
     behind_forks = []
     longest_full_name_length = 0
-    for i, fork in enumerate(forks[:]):
+    for fork in forks:
         longest_full_name_length = max(len(fork["full_name"]), longest_full_name_length)
-        fork[i] = parse_fork_dates(fork)
-        if fork["pushed_at"] > repodata["pushed_at"]:
+        parse_fork_dates(fork)
+        if "ahead_by" in fork:
+            # A real comparison with the base's default branch beats comparing push dates.
+            if fork["ahead_by"] > 0:
+                ahead_forks.append(fork)
+            elif fork["behind_by"] == 0:
+                even_forks.append(fork)
+            else:
+                behind_forks.append(fork)
+        elif fork["pushed_at"] > repodata["pushed_at"]:
             ahead_forks.append(fork)
         elif fork["pushed_at"] == repodata["pushed_at"]:
             even_forks.append(fork)
@@ -127,33 +285,71 @@ def print_original_repo_stats(branches_num, commits_num, repo, repodata):
 
 def parse_fork_dates(_fork):
     for _k, _v in _fork.items():
-        if _k.endswith("_at"):
+        if _k.endswith("_at") and isinstance(_v, str):
             _fork[_k] = dt.fromisoformat(_v.removesuffix("Z"))
     return _fork
 
 
 def pformat_fork(fork, padding) -> str:
-    return f"{fork['full_name']:{padding}} | Last push: {fork['pushed_at']} | ⭐️: {fork['stargazers_count']} | Link: {fork['html_url']}"
+    comparison = f" | +{fork['ahead_by']}/-{fork['behind_by']}" if "ahead_by" in fork else ""
+    if "changed_files" in fork:
+        comparison += f" ({fork['changed_files']} files)"
+    return f"{fork['full_name']:{padding}} | Last push: {fork['pushed_at']} | ⭐️: {fork['stargazers_count']}{comparison} | Link: {fork['html_url']}"
 
 
-def get_fork_description(fork) -> str:
-    return fork["description"] or ("🤖 " + summarize_readme(fork))
+def fork_priority(fork):
+    """Rate-limiter priority: lower goes first, so the most-starred forks resolve first."""
+    return -fork["stargazers_count"]
 
 
-def summarize_readme(fork):
+async def fetch_readme(fork):
+    """(blob SHA, text) of the fork's README.md, or None if it has none."""
     from base64 import b64decode
 
-    client = get_openai_client()
+    if "readme_text" in fork:
+        # Already fetched by the GraphQL query; None means no README.md (or a binary one).
+        return (fork["readme_oid"], fork["readme_text"]) if fork["readme_text"] is not None else None
     # https://api.github.com/repos/OWNER/REPO/contents/PATH
-    readme_content: str = b64decode(
-        github_api_get(f"repos/{fork['full_name']}/contents/README.md")
-        .json()["content"]
-        .encode("utf-8")
-    ).decode("utf-8")
-    return cacheable_summary(client, readme_content)
+    response = await github_api_get(
+        f"repos/{fork['full_name']}/contents/README.md", priority=fork_priority(fork)
+    )
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    return data["sha"], b64decode(data["content"].encode("utf-8")).decode("utf-8", "replace")
 
 
-def cacheable_summary(client, readme_content):
+async def summarize_readmes(forks, readme_tasks, llm_concurrency) -> dict[str, str]:
+    """Descriptions for the forks in `readme_tasks`, with one summary per distinct README.
+
+    Most forks carry a byte-identical copy of the upstream README, so they share its blob SHA
+    and its summary. Distinct READMEs are summarised most-starred fork first, at most
+    `llm_concurrency` at a time (the client is blocking, so each call runs on a worker thread).
+    """
+    readmes = dict(zip(readme_tasks, await asyncio.gather(*readme_tasks.values()), strict=True))
+    texts_by_sha = {}
+    for fork in sorted(forks, key=fork_priority):
+        readme = readmes.get(fork["full_name"])
+        if readme:
+            texts_by_sha.setdefault(*readme)
+    semaphore = asyncio.Semaphore(llm_concurrency)
+
+    async def summarize(readme_content):
+        async with semaphore:
+            return await asyncio.to_thread(cacheable_summary, readme_content)
+
+    summaries = dict(
+        zip(texts_by_sha, await asyncio.gather(*(summarize(text) for text in texts_by_sha.values())), strict=True)
+    )
+    if readmes:
+        print(f"[dim]{len(readmes)} forks without a description, {len(texts_by_sha)} distinct READMEs summarised")
+    return {
+        full_name: "🤖 " + (summaries[readme[0]] if readme else "(no README)")
+        for full_name, readme in readmes.items()
+    }
+
+
+def cacheable_summary(readme_content):
     messages = [
         {
             "role": "system",
@@ -167,22 +363,492 @@ def cacheable_summary(client, readme_content):
         stream=False,
         temperature=0.0,
     )
+    if llm_backend == "stub":
+        return stub_complete(**kwargs)
     return complete(**kwargs)
 
 
-def github_api_get(url, headers={}, params={}):
-    return requests.get(
-        "https://api.github.com/" + url,
-        headers={
-            "Accept": "application/vnd.github+json",
-            "Authorization": f"Bearer {github_token()}",
-            "X-GitHub-Api-Version": "2022-11-28",
-            **headers,
-        },
-        params=params,
+# Set by --llm.
+llm_backend = "openai"
+STUB_LLM_LATENCY_SECONDS = 0.05
+
+
+def stub_complete(**kwargs) -> str:
+    """Offline stand-in for `complete`: the README's first prose sentence, after a fixed delay."""
+    time.sleep(STUB_LLM_LATENCY_SECONDS)
+    for raw_line in kwargs["messages"][-1]["content"].splitlines():
+        line = raw_line.strip()
+        if line and not line.startswith(("#", "!", "[", "<", "```", "|", "-", "*", ">")):
+            return line.split(". ")[0].rstrip(".") + "."
+    return "(README has no prose)"
+
+
+class RateLimiter:
+    """Caps requests in flight and paces them by GitHub's rate-limit headers.
+
+    While plenty of the hourly budget is left requests go out as fast as the concurrency cap
+    allows. Below LOW_WATERMARK of it, starts are spaced so the remainder lasts until the reset
+    instead of running dry (which is also what trips the secondary limits). A 403/429 carrying
+    Retry-After, or an exhausted budget, pauses every request until GitHub says to resume.
+    """
+
+    LOW_WATERMARK = 0.1
+
+    def __init__(self, concurrency=8):
+        self.set_concurrency(concurrency)
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.next_start = 0.0
+
+    def set_concurrency(self, concurrency):
+        self.concurrency = max(1, concurrency)
+        self.in_flight = 0
+        self.waiters = []  # heap of (priority, seq, future)
+        self.seq = itertools.count()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority=0):
+        """Like a semaphore of `concurrency` slots, but waiters are served lowest priority first."""
+        if self.in_flight < self.concurrency and not self.waiters:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, next(self.seq), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.release()  # The slot was handed over just as we were cancelled.
+                raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def release(self):
+        # Hand the slot straight to the next live waiter, so in_flight never dips and gets raced.
+        while self.waiters:
+            _, _, waiter = heapq.heappop(self.waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def spacing(self, now):
+        if self.remaining is None or not self.limit or self.remaining > self.limit * self.LOW_WATERMARK:
+            return 0.0
+        return max(0.0, self.reset_at - now) / max(1, self.remaining)
+
+    async def wait_turn(self):
+        now = time.monotonic()
+        start = max(now, self.paused_until, self.next_start)
+        self.next_start = start + self.spacing(now)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def update(self, response) -> float | None:
+        """Record the response's rate-limit headers; returns seconds to wait before retrying, or None."""
+        headers = response.headers
+        now = time.monotonic()
+        if "X-RateLimit-Remaining" in headers:
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+            self.limit = int(headers.get("X-RateLimit-Limit", self.limit or 0)) or None
+            if "X-RateLimit-Reset" in headers:
+                self.reset_at = now + max(0.0, int(headers["X-RateLimit-Reset"]) - time.time())
+        if response.status_code not in (403, 429):
+            return None
+        if "Retry-After" in headers:
+            delay = float(headers["Retry-After"])
+        elif self.remaining == 0:
+            delay = max(1.0, self.reset_at - now)
+        else:
+            return None
+        self.paused_until = max(self.paused_until, now + delay)
+        print(f"[dim]GitHub rate limit hit; pausing {delay:.0f}s")
+        return delay
+
+
+@cache
+def rate_limiter():
+    return RateLimiter()
+
+
+GITHUB_API_URL = "https://api.github.com/"
+# Pointed at the stand-in server by --bench.
+github_api_url = GITHUB_API_URL
+
+
+@cache
+def github_client():
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+    transport = None
+    if fixtures_mode == "replay":
+        transport = ReplayTransport(replay_latency_seconds)
+    elif github_api_url == GITHUB_API_URL:
+        headers["Authorization"] = f"Bearer {github_token()}"
+        if fixtures_mode == "record":
+            transport = RecordingTransport()
+    return httpx.AsyncClient(
+        base_url=github_api_url,
+        headers=headers,
+        transport=transport,
+        limits=httpx.Limits(max_connections=rate_limiter().concurrency),
+        timeout=30,
+    )
+
+
+async def github_request(method, url, priority=0, **kwargs):
+    limiter = rate_limiter()
+    while True:
+        async with limiter.slot(priority):
+            await limiter.wait_turn()
+            response = await github_client().request(method, url, **kwargs)
+        delay = limiter.update(response)
+        if delay is None:
+            return response
+        await asyncio.sleep(delay)
+
+
+HTTP_CACHE_PATH = Path.home() / ".cache/land/getforks-http.db"
+HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Cleared by --no-http-cache.
+use_http_cache = True
+
+
+@cache
+def http_cache():
+    HTTP_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(HTTP_CACHE_PATH, isolation_level=None, timeout=5)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+        "headers TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+    return db
+
+
+def http_cache_key(url, headers, params) -> str:
+    return json.dumps([url, sorted(params.items()), headers.get("Accept", "")], default=str)
+
+
+def http_cache_store(key, response):
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if not (etag or last_modified):
+        return
+    # The body is stored decoded, so the encoding/length headers no longer describe it.
+    headers = {
+        k: v for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+    }
+    db = http_cache()
+    with db:
+        db.execute("BEGIN")
+        db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, etag, last_modified, json.dumps(headers), response.content, len(response.content), time.time()),
+        )
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total > HTTP_CACHE_MAX_BYTES:
+            db.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS running FROM responses
+                    ) WHERE running > ?
+                )""",
+                (HTTP_CACHE_MAX_BYTES,),
+            )
+
+
+async def github_api_get(url, headers={}, params={}, priority=0):
+    """GET through a persistent conditional-request cache.
+
+    A cached response's ETag/Last-Modified go out as If-None-Match/If-Modified-Since; GitHub
+    answers 304 for unchanged resources without charging the rate limit, and the stored
+    response (Link header included) is returned in its place. Least recently used entries
+    are evicted past HTTP_CACHE_MAX_BYTES.
+    """
+    if not use_http_cache:
+        return await github_request("GET", url, priority=priority, headers=headers, params=params)
+    key = http_cache_key(url, headers, params)
+    cached = http_cache().execute(
+        "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?", (key,)
+    ).fetchone()
+    request_headers = dict(headers)
+    if cached:
+        etag, last_modified, _, _ = cached
+        if etag:
+            request_headers["If-None-Match"] = etag
+        if last_modified:
+            request_headers["If-Modified-Since"] = last_modified
+    response = await github_request("GET", url, priority=priority, headers=request_headers, params=params)
+    if response.status_code == 304 and cached:
+        http_cache().execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return httpx.Response(200, headers=json.loads(cached[2]), content=cached[3], request=response.request)
+    if response.status_code == 200:
+        http_cache_store(key, response)
+    return response
+
+
+def parse_link_header(value) -> dict[str, str]:
+    """`<https://...?page=2>; rel="next", <https://...?page=9>; rel="last"` -> {"next": ..., "last": ...}"""
+    links = {}
+    for part in value.split(","):
+        url, _, rel = part.partition(";")
+        rel = rel.strip().removeprefix("rel=").strip('"')
+        if rel:
+            links[rel] = url.strip().strip("<>")
+    return links
+
+
+async def github_api_paginate(url, params=None, per_page=100):
+    """Yield each page's items as it arrives.
+
+    The first page's Link header gives the last page number, so the remaining pages are
+    requested concurrently and yielded in completion order, not page order. Endpoints that
+    only send rel="next" are followed one page at a time. A `page` in `params` starts there.
+    """
+    params = {**(params or {}), "per_page": per_page}
+    response = await github_api_get(url, params=params)
+    yield response.json()
+    links = parse_link_header(response.headers.get("Link", ""))
+    if "last" in links:
+        last_page = int(httpx.URL(links["last"]).params["page"])
+        pages = [
+            asyncio.create_task(github_api_get(url, params={**params, "page": page}))
+            for page in range(int(params.get("page", 1)) + 1, last_page + 1)
+        ]
+        for page in asyncio.as_completed(pages):
+            yield (await page).json()
+        return
+    while "next" in links:
+        response = await github_api_get(links["next"])
+        yield response.json()
+        links = parse_link_header(response.headers.get("Link", ""))
+
+
+async def github_api_count(url, params=None):
+    """Number of items a list endpoint has, from one `per_page=1` request: the last page's number is the count."""
+    response = await github_api_get(url, params={**(params or {}), "per_page": 1})
+    if response.status_code == 409:  # Empty repository
+        return 0
+    links = parse_link_header(response.headers.get("Link", ""))
+    if "last" in links:
+        return int(httpx.URL(links["last"]).params["page"])
+    return len(response.json())
+
+
+async def fetch_repo_rest(repo):
+    """(repodata, commits_num, branches_num, async iterator of fork pages) through the REST API."""
+    commits_task = asyncio.create_task(github_api_count(f"repos/{repo}/commits"))
+    branches_task = asyncio.create_task(github_api_count(f"repos/{repo}/branches"))
+    repodata = parse_fork_dates((await github_api_get("repos/" + repo)).json())
+    commits_num, branches_num = await asyncio.gather(commits_task, branches_task)
+    return repodata, commits_num, branches_num, github_api_paginate(f"repos/{repo}/forks", params={"sort": "stargazers"})
+
+
+COMPARE_CACHE_PATH = Path.home() / ".cache/land/getforks-compare.json"
+
+
+@cache
+def compare_cache():
+    try:
+        return json.loads(COMPARE_CACHE_PATH.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_compare_cache():
+    if compare_cache.cache_info().currsize:
+        COMPARE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        COMPARE_CACHE_PATH.write_text(json.dumps(compare_cache()))
+
+
+async def compare_fork(repo, repodata, fork):
+    """Set ahead_by/behind_by/changed_files on `fork` from `base...fork:branch`.
+
+    Results are cached on disk under both sides' push dates; a comparison can only change
+    once one of them is pushed to.
+    """
+    if not fork.get("default_branch") or not repodata.get("default_branch"):
+        return
+    owner = fork["full_name"].split("/")[0]
+    base = f"{repodata['default_branch']}...{owner}:{fork['default_branch']}"
+    key = f"{repo}@{repodata['pushed_at']}:{base}@{fork['pushed_at']}"
+    comparison = compare_cache().get(key)
+    if comparison is None:
+        # per_page=1: only one commit in the body; the changed files still come with the first page.
+        response = await github_api_get(
+            f"repos/{repo}/compare/{base}", params={"per_page": 1}, priority=fork_priority(fork)
+        )
+        if response.status_code != 200:
+            return  # No common history, or the branch is gone: keep the push-date grouping.
+        data = response.json()
+        comparison = {
+            "ahead_by": data["ahead_by"],
+            "behind_by": data["behind_by"],
+            "changed_files": len(data.get("files", [])),
+        }
+        compare_cache()[key] = comparison
+    fork.update(comparison)
+
+
+async def compare_forks(repo, repodata, forks):
+    await asyncio.gather(*(compare_fork(repo, repodata, fork) for fork in forks))
+    return forks
+
+
+class GraphQLError(Exception):
+    pass
+
+
+async def github_graphql(query, variables):
+    response = await github_request("POST", "graphql", json={"query": query, "variables": variables})
+    if response.status_code != 200:
+        msg = f"HTTP {response.status_code}"
+        raise GraphQLError(msg)
+    payload = response.json()
+    if payload.get("data") is None:
+        raise GraphQLError("; ".join(error.get("message", "?") for error in payload.get("errors", [])) or "no data")
+    return payload["data"]
+
+
+GRAPHQL_FORKS_PER_QUERY = 100
+# Tries per fork page after the first; a page that still fails is continued over REST.
+GRAPHQL_PAGE_ATTEMPTS = 3
+GRAPHQL_REPO_FORKS_QUERY = """
+query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    description createdAt updatedAt pushedAt forkCount stargazerCount
+    issues(states: OPEN) { totalCount }
+    pullRequests(states: OPEN) { totalCount }
+    refs(refPrefix: "refs/heads/", first: 0) { totalCount }
+    defaultBranchRef { name target { ... on Commit { history(first: 0) { totalCount } } } }
+    forks(first: $first, after: $cursor, orderBy: {field: STARGAZERS, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        nameWithOwner url description stargazerCount createdAt updatedAt pushedAt
+        defaultBranchRef { name }
+        readme: object(expression: "HEAD:README.md") { ... on Blob { oid text } }
+      }
+    }
+  }
+}
+"""
+
+
+def graphql_compare_query(forks) -> str:
+    """One `compare` per fork, aliased f0..fN, against the base repo's default branch."""
+    comparisons = "\n".join(
+        f"f{i}: compare(headRef: {json.dumps(fork['owner'] + ':' + fork['default_branch'])}) {{ aheadBy behindBy }}"
+        for i, fork in enumerate(forks)
+    )
+    return (
+        "query($owner: String!, $name: String!, $base: String!) {\n"
+        "  repository(owner: $owner, name: $name) { ref(qualifiedName: $base) {\n"
+        f"{comparisons}\n"
+        "  } }\n"
+        "}"
     )
 
 
+def graphql_fork(node):
+    """A GraphQL fork node in the REST shape the rest of the script reads."""
+    default_branch = (node.get("defaultBranchRef") or {}).get("name")
+    return {
+        "full_name": node["nameWithOwner"],
+        "owner": node["nameWithOwner"].split("/")[0],
+        "html_url": node["url"],
+        "description": node["description"],
+        "stargazers_count": node["stargazerCount"],
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "pushed_at": node["pushedAt"],
+        "default_branch": default_branch,
+        "readme_oid": (node.get("readme") or {}).get("oid"),
+        "readme_text": (node.get("readme") or {}).get("text"),
+    }
+
+
+async def add_graphql_comparisons(owner, name, base_branch, forks):
+    """Set ahead_by/behind_by on the forks GitHub can compare; the rest keep the push-date grouping."""
+    comparable = [fork for fork in forks if fork["default_branch"]]
+    if not comparable or not base_branch:
+        return
+    try:
+        data = await github_graphql(
+            graphql_compare_query(comparable),
+            {"owner": owner, "name": name, "base": f"refs/heads/{base_branch}"},
+        )
+    except GraphQLError:
+        return
+    ref = (data.get("repository") or {}).get("ref") or {}
+    for i, fork in enumerate(comparable):
+        comparison = ref.get(f"f{i}")
+        if comparison:
+            fork["ahead_by"] = comparison["aheadBy"]
+            fork["behind_by"] = comparison["behindBy"]
+
+
+async def fetch_repo_graphql(repo):
+    """Like fetch_repo_rest, but each page of up to 100 forks, with README text, is one GraphQL query,
+    plus one more query comparing that page's forks with the base."""
+    owner, name = repo.split("/")[:2]
+    variables = {"owner": owner, "name": name, "first": GRAPHQL_FORKS_PER_QUERY, "cursor": None}
+    repository = (await github_graphql(GRAPHQL_REPO_FORKS_QUERY, variables))["repository"]
+    if repository is None:
+        msg = f"repository {repo} not found"
+        raise GraphQLError(msg)
+    default_branch = repository["defaultBranchRef"] or {}
+    repodata = parse_fork_dates({
+        "description": repository["description"],
+        "default_branch": default_branch.get("name"),
+        "created_at": repository["createdAt"],
+        "updated_at": repository["updatedAt"],
+        "pushed_at": repository["pushedAt"],
+        "forks": repository["forkCount"],
+        "open_issues": repository["issues"]["totalCount"] + repository["pullRequests"]["totalCount"],
+        "watchers": repository["stargazerCount"],
+    })
+    commits_num = ((default_branch.get("target") or {}).get("history") or {}).get("totalCount", 0)
+    branches_num = repository["refs"]["totalCount"]
+
+    async def fork_pages(forks_connection):
+        pages_done = 0
+        while True:
+            forks = [graphql_fork(node) for node in forks_connection["nodes"] if node]
+            await add_graphql_comparisons(owner, name, repodata["default_branch"], forks)
+            yield forks
+            pages_done += 1
+            if not forks_connection["pageInfo"]["hasNextPage"]:
+                return
+            variables["cursor"] = forks_connection["pageInfo"]["endCursor"]
+            for attempt in range(GRAPHQL_PAGE_ATTEMPTS):
+                if attempt:
+                    await asyncio.sleep(2**attempt)
+                try:
+                    forks_connection = (await github_graphql(GRAPHQL_REPO_FORKS_QUERY, variables))["repository"]["forks"]
+                    break
+                except GraphQLError as e:
+                    error = e
+            else:
+                # Same stargazer order and page size over REST, so pick up at the next page.
+                print(f"[dim]GraphQL failed on fork page {pages_done + 1} ({error}); continuing over REST")
+                async for rest_forks in github_api_paginate(
+                    f"repos/{repo}/forks",
+                    params={"sort": "stargazers", "page": pages_done + 1},
+                    per_page=GRAPHQL_FORKS_PER_QUERY,
+                ):
+                    yield rest_forks
+                return
+
+    return repodata, commits_num, branches_num, fork_pages(repository["forks"])
+
+
 @cache
 def github_token():
     return Path.home().joinpath(".github-token").read_text().strip()
@@ -196,6 +862,100 @@ def get_openai_client():
     return Client(api_key=api_key)
 
 
+# Set by --record/--replay.
+fixtures_mode = None
+fixtures_dir = None
+replay_latency_seconds = 0.0
+
+
+def fixture_path(kind, key_material) -> Path:
+    key = hashlib.sha256(json.dumps(key_material, sort_keys=True).encode("utf-8")).hexdigest()
+    return fixtures_dir / kind / f"{key}.json"
+
+
+def request_fixture_path(request) -> Path:
+    return fixture_path("http", [request.method, str(request.url), request.content.decode("utf-8", "replace")])
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Passes requests to the network and saves each response under fixtures_dir/http."""
+
+    def __init__(self):
+        self.transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+        await response.aclose()
+        headers = {
+            k: v for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        }
+        path = request_fixture_path(request)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "url": str(request.url),
+            "status": response.status_code,
+            "headers": headers,
+            "body": base64.b64encode(body).decode("ascii"),
+        }))
+        return httpx.Response(response.status_code, headers=headers, content=body)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Answers from fixtures_dir/http after `latency` seconds, with a rate-limit budget that
+    counts down like GitHub's. Requests that weren't recorded get a 404."""
+
+    RATE_LIMIT = 5000
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.remaining = self.RATE_LIMIT
+        self.reset = int(time.time()) + 3600
+
+    async def handle_async_request(self, request):
+        await asyncio.sleep(self.latency)
+        self.remaining = max(0, self.remaining - 1)
+        rate_limit_headers = {
+            "X-RateLimit-Limit": str(self.RATE_LIMIT),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset),
+        }
+        try:
+            fixture = json.loads(request_fixture_path(request).read_text())
+        except FileNotFoundError:
+            return httpx.Response(404, headers=rate_limit_headers, json={"message": f"Not recorded: {request.url}"})
+        headers = {k: v for k, v in fixture["headers"].items() if not k.lower().startswith("x-ratelimit-")}
+        return httpx.Response(
+            fixture["status"], headers={**headers, **rate_limit_headers}, content=base64.b64decode(fixture["body"])
+        )
+
+
+def completion_fixtures(func):
+    """--record saves each completion next to the HTTP fixtures; --replay serves it back
+    (falling back to stub_complete for prompts that weren't recorded)."""
+
+    @functools.wraps(func)
+    def wrapper(**kwargs):
+        if fixtures_mode is None:
+            return func(**kwargs)
+        path = fixture_path("completions", {k: v for k, v in kwargs.items() if k != "stream"})
+        if fixtures_mode == "replay":
+            try:
+                return json.loads(path.read_text())["content"]
+            except FileNotFoundError:
+                return stub_complete(**kwargs)
+        result = func(**kwargs)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"content": result}))
+        return result
+
+    return wrapper
+
+
+@completion_fixtures
 @disk_cache
 def complete(**kwargs) -> str:
     client = get_openai_client()
@@ -203,5 +963,147 @@ def complete(**kwargs) -> str:
     return response.choices[0].message.content
 
 
+class StandInGitHub(BaseHTTPRequestHandler):
+    """Just enough of GitHub's REST and GraphQL APIs for the fork pipeline, over synthetic repos.
+
+    `bench/forks-N` has N forks, most-starred first. A third have their own description; most
+    of the rest carry the upstream README unchanged. Every response waits `latency` seconds
+    and reports a rate-limit budget.
+    """
+
+    latency = 0.0
+    requests = 0
+    lock = threading.Lock()
+    README = "# forks\n\nBenchmark upstream project. It does one thing well.\n"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Limit", "1000000")
+        self.send_header("X-RateLimit-Remaining", str(1_000_000 - StandInGitHub.requests))
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def count_request(self):
+        with StandInGitHub.lock:
+            StandInGitHub.requests += 1
+        time.sleep(self.latency)
+
+    @staticmethod
+    def fork(i, n):
+        return {
+            "full_name": f"user{i}/forks-{n}",
+            "html_url": f"https://github.com/user{i}/forks-{n}",
+            "description": f"Fork {i}'s own take." if i % 3 == 0 else None,
+            "stargazers_count": n - i,
+            "default_branch": "main",
+            "created_at": "2023-01-01T00:00:00Z",
+            "updated_at": "2024-01-01T00:00:00Z",
+            "pushed_at": f"2024-01-{1 + i % 28:02d}T00:00:00Z",
+        }
+
+    @classmethod
+    def readme(cls, i):
+        return cls.README if i % 10 else f"# fork {i}\n\nFork {i} adds its own features. And more.\n"
+
+    def do_GET(self):
+        self.count_request()
+        url = httpx.URL(self.path)
+        parts = url.path.strip("/").split("/")
+        n = int(parts[2].removeprefix("forks-"))
+        per_page, page = int(url.params.get("per_page", 30)), int(url.params.get("page", 1))
+        if len(parts) == 3:
+            return self.send_json({
+                "description": "Benchmark upstream project.", "default_branch": "main", "forks": n,
+                "open_issues": 0, "watchers": n, "created_at": "2020-01-01T00:00:00Z",
+                "updated_at": "2024-01-15T00:00:00Z", "pushed_at": "2024-01-15T00:00:00Z",
+            })
+        if parts[3] == "commits" or parts[3] == "branches":
+            total = 1234 if parts[3] == "commits" else 7
+            last = -(-total // per_page)
+            link = f'<{url.copy_with(query=None)}?per_page={per_page}&page={last}>; rel="last"'
+            return self.send_json([{}] * min(per_page, total), headers={"Link": link})
+        if parts[3] == "forks":
+            last = max(1, -(-n // per_page))
+            link = f'<{url.copy_with(query=None)}?per_page={per_page}&page={last}>; rel="last"'
+            forks = [self.fork(i, n) for i in range((page - 1) * per_page, min(n, page * per_page))]
+            return self.send_json(forks, headers={"Link": link})
+        if parts[3] == "contents":
+            i = int(parts[1].removeprefix("user"))
+            text = self.readme(i).encode("utf-8")
+            return self.send_json({
+                "sha": hashlib.sha1(text).hexdigest(), "content": base64.b64encode(text).decode("ascii")
+            })
+        self.send_json({"message": "Not Found"}, status=404)
+
+    def do_POST(self):
+        self.count_request()
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        variables = body["variables"]
+        n = int(variables["name"].removeprefix("forks-"))
+        if "compare(" in body["query"]:
+            aliases = [line.split(":")[0].strip() for line in body["query"].splitlines() if "compare(" in line]
+            return self.send_json({"data": {"repository": {"ref": {
+                alias: {"aheadBy": i % 3, "behindBy": i % 5} for i, alias in enumerate(aliases)
+            }}}})
+        start = int(variables["cursor"] or 0)
+        end = min(n, start + variables["first"])
+        nodes = []
+        for i in range(start, end):
+            fork = self.fork(i, n)
+            text = self.readme(i)
+            nodes.append({
+                "nameWithOwner": fork["full_name"], "url": fork["html_url"], "description": fork["description"],
+                "stargazerCount": fork["stargazers_count"], "createdAt": fork["created_at"],
+                "updatedAt": fork["updated_at"], "pushedAt": fork["pushed_at"], "defaultBranchRef": {"name": "main"},
+                "readme": {"oid": hashlib.sha1(text.encode("utf-8")).hexdigest(), "text": text},
+            })
+        self.send_json({"data": {"repository": {
+            "description": "Benchmark upstream project.", "createdAt": "2020-01-01T00:00:00Z",
+            "updatedAt": "2024-01-15T00:00:00Z", "pushedAt": "2024-01-15T00:00:00Z", "forkCount": n,
+            "stargazerCount": n, "issues": {"totalCount": 0}, "pullRequests": {"totalCount": 0},
+            "refs": {"totalCount": 7}, "defaultBranchRef": {"name": "main", "target": {"history": {"totalCount": 1234}}},
+            "forks": {"pageInfo": {"hasNextPage": end < n, "endCursor": str(end)}, "nodes": nodes},
+        }}})
+
+
+def benchmark(sizes, latency, concurrency, llm_concurrency):
+    """End-to-end runs against StandInGitHub on localhost; output of the runs is discarded."""
+    global github_api_url, use_http_cache, llm_backend
+    StandInGitHub.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInGitHub)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    github_api_url = f"http://127.0.0.1:{server.server_port}/"
+    use_http_cache = False
+    llm_backend = "stub"
+    print(f"Stand-in GitHub at {github_api_url}, {latency * 1000:.0f} ms latency, concurrency {concurrency}/{llm_concurrency}")
+    print(f"{'forks':>7} {'mode':>8} {'seconds':>9} {'requests':>9}")
+    try:
+        for size in sizes:
+            for use_graphql in (True, False):
+                github_client.cache_clear()
+                rate_limiter.cache_clear()
+                rate_limiter().set_concurrency(concurrency)
+                StandInGitHub.requests = 0
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    asyncio.run(amain(f"bench/forks-{size}", use_graphql=use_graphql, llm_concurrency=llm_concurrency))
+                elapsed = time.perf_counter() - start
+                mode = "graphql" if use_graphql else "rest"
+                print(f"{size:>7} {mode:>8} {elapsed:>9.2f} {StandInGitHub.requests:>9}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 if __name__ == "__main__":
     main()
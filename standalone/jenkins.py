@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 # py39 ${LAND}/standalone/jenkins.py 5456 -b 3
+import asyncio
 import json
-from dataclasses import dataclass
+import sqlite3
+import statistics
+from dataclasses import dataclass, field
 from typing import Any, Optional
 
 import sys
@@ -21,6 +24,9 @@ except:
 # import debug
 import time
 from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import subprocess as sp
 import requests
 from datetime import timedelta, datetime
@@ -30,61 +36,86 @@ token = os.environ.get("JENKINS_TOKEN", "")
 print(f"$JENKINS_USERNAME: {username}", f"$JENKINS_TOKEN: {token}", sep="\n")
 
 
+JOBS_URL = "http://jmaster-ssbu-01.rdlab.local/job/allot_secure_team_multiproject/job"
+# Seconds before a request to a stalled master gives up, so the watcher errors instead of hanging.
+REQUEST_TIMEOUT = 30
+# Only the fields the watcher diffs; `tree=` keeps each poll to a few hundred bytes.
+WATCH_TREE = "number,building,result,duration,estimatedDuration,timestamp,nextBuild[number,url]"
+# What JenkinsJob reads. Nested objects need their fields listed or they come back as just
+# {"_class": ...}; buildsByBranchName is a map, so its selection applies to each branch's entry.
+# artifacts, changeSets, culprits and the rest of `actions` can be megabytes on big builds and
+# are never used, so they're left out.
+JOB_TREE = (
+    "building,description,displayName,duration,estimatedDuration,fullDisplayName,id,keepLog,"
+    "number,queueId,result,timestamp,url,nextBuild[number,url],previousBuild[number,url],"
+    "actions[causes[shortDescription],buildsByBranchName[buildResult,marked[SHA1,branch[SHA1,name]]]]"
+)
+# One request for the whole build list, instead of walking nextBuild a build at a time.
+# `builds` is capped at the newest 100; older ones are paged out of `allBuilds{m,n}`.
+HISTORY_FIELDS = "number,result,timestamp,duration"
+HISTORY_PAGE = 100
+HISTORY_PATH = Path.home() / ".cache/land/jenkins-history.db"
+# slots=True needs 3.10; the header says this still runs on 3.9.
+DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
 def sleep(sec):
-    print(f"Sleeping {sec}s...")
+    print(f"Sleeping {sec:.0f}s...")
     time.sleep(sec)
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Commit:
     sha: str
     message: str
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Branch:
     sha: str
     name: str
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Build:
     number: int
     url: str
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class JenkinsJob:
     actions: list[dict]
-    artifacts: list
     building: bool
     description: str
     displayName: str
     duration: int
     estimatedDuration: int
-    executor: Any
     fullDisplayName: str
     id: int
     keepLog: bool
     number: int
-    pr_id: int
+    pr_id: Optional[int]
     queueId: int
     result: str
     timestamp: int
     url: str
-    changeSets: list
-    culprits: list
     nextBuild: Optional[Build]
     previousBuild: Optional[Build]
+    # Not in JOB_TREE; kept so the shape matches Jenkins' build object.
+    artifacts: list = field(default_factory=list)
+    executor: Any = None
+    changeSets: list = field(default_factory=list)
+    culprits: list = field(default_factory=list)
+    job_name: str = ""
     shortDescription: str = ""
     commit: Commit = None
     branch: Branch = None
 
     def __post_init__(self):
         if self.nextBuild:
-            self.nextBuild = Build(**self.nextBuild)
+            self.nextBuild = Build(self.nextBuild["number"], self.nextBuild["url"])
         if self.previousBuild:
-            self.previousBuild = Build(**self.previousBuild)
+            self.previousBuild = Build(self.previousBuild["number"], self.previousBuild["url"])
         for action in self.actions:
             if "causes" in action:
                 causes = action["causes"]
@@ -93,18 +124,21 @@ class JenkinsJob:
                         self.shortDescription = cause["shortDescription"]
             elif (
                 "buildsByBranchName" in action
-                and f"PR-{self.pr_id}" in action["buildsByBranchName"]
+                and self.job_name in action["buildsByBranchName"]
             ):
-                build = action["buildsByBranchName"][f"PR-{self.pr_id}"]
+                build = action["buildsByBranchName"][self.job_name]
                 # buildNumber, buildResult, marked, revision
                 if buildResult := build.get("buildResult"):
                     print("\nbuildResult!", buildResult, end="\n\n")
                 # other_marked = {k:v for k,v in build['marked'].items() if k != 'SHA1'}
                 # if other_marked:
                 #     print(f'\nOther marked! {other_marked}\n')
-                self.commit = Commit(build["marked"]["SHA1"], "")
-                branch, *branches = build["marked"]["branch"]
-                self.branch = Branch(branch["SHA1"], branch["name"])
+                marked = build.get("marked") or {}
+                if "SHA1" in marked:
+                    self.commit = Commit(marked["SHA1"], "")
+                branch, *branches = marked.get("branch") or [{}]
+                if "name" in branch:
+                    self.branch = Branch(branch["SHA1"], branch["name"])
                 if branches:
                     print(f"\nOther branches! {branches}\n")
 
@@ -133,50 +167,257 @@ class JenkinsJob:
     def from_url(cls, job, build: int) -> "JenkinsJob":
         print(f"Fetching {build = }...")
         response = requests.get(
-            f"http://jmaster-ssbu-01.rdlab.local/job/allot_secure_team_multiproject/job/{job}/{build}/api/python?pretty=true",
+            f"{JOBS_URL}/{job}/{build}/api/json",
+            params={"tree": JOB_TREE},
             auth=(username, token),
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        return cls.from_json(response.json(), job)
+
+    @classmethod
+    def from_json(cls, data: dict, job_name: str) -> "JenkinsJob":
+        """Picks the JOB_TREE fields out of the decoded JSON and ignores the rest.
+
+        Actions with nothing but a `_class` are dropped; `_class` keys nested in the kept ones
+        stay, nothing reads them.
+        """
+        return cls(
+            actions=[action for action in data.get("actions") or [] if set(action) - {"_class"}],
+            building=data.get("building"),
+            description=data.get("description"),
+            displayName=data.get("displayName"),
+            duration=data.get("duration"),
+            estimatedDuration=data.get("estimatedDuration"),
+            fullDisplayName=data.get("fullDisplayName"),
+            id=data.get("id"),
+            keepLog=data.get("keepLog"),
+            number=data.get("number"),
+            pr_id=int(job_name.removeprefix("PR-")) if job_name.startswith("PR-") else None,
+            queueId=data.get("queueId"),
+            result=data.get("result"),
+            timestamp=data.get("timestamp"),
+            url=data.get("url"),
+            nextBuild=data.get("nextBuild"),
+            previousBuild=data.get("previousBuild"),
+            job_name=job_name,
         )
-        data = eval(response.text)
 
-        data = remove_items_recursive(data, lambda k, v: k in ("_class",) or v == {})
 
-        return cls(**data, pr_id=int(job.removeprefix("PR-")))
+def fetch_build_state(job_name: str, build: int) -> dict:
+    response = requests.get(
+        f"{JOBS_URL}/{job_name}/{build}/api/json",
+        params={"tree": WATCH_TREE},
+        auth=(username, token),
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    state = response.json()
+    state.pop("_class", None)
+    return state
+
+
+def fetch_console(job_name: str, build: int, offset: int) -> tuple[str, int, bool]:
+    """Console text from `offset` on: (text, next offset, whether Jenkins has more coming)."""
+    response = requests.get(
+        f"{JOBS_URL}/{job_name}/{build}/logText/progressiveText",
+        params={"start": offset},
+        auth=(username, token),
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    next_offset = int(response.headers.get("X-Text-Size", offset))
+    return response.text, next_offset, response.headers.get("X-More-Data") == "true"
+
+
+def fetch_builds(job_name: str, tree: str = f"builds[{HISTORY_FIELDS}]") -> list[dict]:
+    """The job's builds, oldest first."""
+    response = requests.get(
+        f"{JOBS_URL}/{job_name}/api/json", params={"tree": tree}, auth=(username, token), timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    data = response.json()
+    builds = data.get("builds") or data.get("allBuilds") or []
+    for build in builds:
+        build.pop("_class", None)
+    return sorted(builds, key=lambda build: build["number"])
+
+
+def history_db():
+    HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(HISTORY_PATH, isolation_level=None, timeout=5)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS builds (job TEXT NOT NULL, number INTEGER NOT NULL, result TEXT, "
+        "timestamp INTEGER NOT NULL, duration INTEGER NOT NULL, PRIMARY KEY (job, number))"
+    )
+    # Oldest build Jenkins still keeps, once a backfill has paged past it; anything older was
+    # discarded and is never asked for again.
+    db.execute("CREATE TABLE IF NOT EXISTS history_ends (job TEXT PRIMARY KEY, oldest INTEGER NOT NULL)")
+    return db
+
+
+def store_history(db, job_name: str, builds: list[dict]):
+    """Finished builds never change, so running ones (no result yet) are left for a later call."""
+    with db:
+        db.execute("BEGIN")
+        db.executemany(
+            "INSERT OR REPLACE INTO builds VALUES (?, ?, ?, ?, ?)",
+            [
+                (job_name, build["number"], build["result"], build["timestamp"], build["duration"])
+                for build in builds
+                if build.get("result")
+            ],
+        )
 
 
-def loop(job: JenkinsJob):
+def backfill_history(db, job_name: str, builds: list[dict], workers: int):
+    """Store `builds`, then page in any older builds not stored yet, `workers` pages at a time.
+
+    Stops at the first short or empty page: that is where the job's history ends, e.g. because
+    a build discarder removed everything older.
+    """
+    store_history(db, job_name, builds)
+    if len(builds) < HISTORY_PAGE:
+        return  # `builds` wasn't capped, so it already is the whole history.
+    newest, oldest = builds[-1]["number"], builds[0]["number"]
+    end = db.execute("SELECT oldest FROM history_ends WHERE job = ?", (job_name,)).fetchone()
+    first_kept = end[0] if end else 1
+    # allBuilds{m,n} pages by position, newest first. Build numbers are near enough contiguous
+    # to take position i as build newest - i, so a page is skipped once those builds are all
+    # stored. Deleted builds shift that mapping a little, which at worst re-fetches a page.
+    ranges = []
+    for start in range(len(builds), len(builds) + oldest - first_kept, HISTORY_PAGE):
+        low, high = max(newest - start - HISTORY_PAGE, first_kept - 1), newest - start
+        (stored,) = db.execute(
+            "SELECT COUNT(*) FROM builds WHERE job = ? AND number > ? AND number <= ?", (job_name, low, high)
+        ).fetchone()
+        if stored < high - low:
+            ranges.append((start, start + HISTORY_PAGE))
+    if not ranges:
+        return
+    print(f"Backfilling up to {len(ranges)} pages of older builds of {job_name}...")
+    with ThreadPoolExecutor(workers) as pool:
+        for wave in range(0, len(ranges), workers):
+            pages = list(pool.map(
+                lambda r: fetch_builds(job_name, f"allBuilds[{HISTORY_FIELDS}]{{{r[0]},{r[1]}}}"),
+                ranges[wave : wave + workers],
+            ))
+            for page in pages:
+                store_history(db, job_name, page)
+            if any(len(page) < HISTORY_PAGE for page in pages):
+                (kept,) = db.execute("SELECT MIN(number) FROM builds WHERE job = ?", (job_name,)).fetchone()
+                db.execute("INSERT OR REPLACE INTO history_ends VALUES (?, ?)", (job_name, min(kept or oldest, oldest)))
+                break
+
+
+def print_duration_trend(db, job_name: str, window: int = 10):
+    """Median duration of the last `window` successful builds against the `window` before them."""
+    durations = [
+        duration / 1000
+        for (duration,) in db.execute(
+            "SELECT duration FROM builds WHERE job = ? AND result = 'SUCCESS' ORDER BY number DESC LIMIT ?",
+            (job_name, window * 2),
+        )
+    ]
+    (total,) = db.execute("SELECT COUNT(*) FROM builds WHERE job = ?", (job_name,)).fetchone()
+    if not durations:
+        print(f"{total} builds of {job_name} stored, none successful yet.")
+        return
+    recent, earlier = durations[:window], durations[window:]
+    trend = f"median of last {len(recent)} successful: {timedelta(seconds=int(statistics.median(recent)))}"
+    if earlier:
+        change = statistics.median(recent) / statistics.median(earlier) - 1
+        trend += f" ({change:+.0%} vs the {len(earlier)} before)"
+    print(f"{total} builds of {job_name} stored; {trend}")
+
+
+class PollSchedule:
+    """How long to wait before the next poll.
+
+    While building, the wait shrinks as the estimated finish (timestamp + estimatedDuration)
+    nears and while fields keep changing; once a build is done and nothing has moved, it
+    backs off towards IDLE_MAX. Streaming console output means the build is alive, so that
+    gets the shortest wait.
+    """
+
+    MIN = 5
+    MAX = 60
+    IDLE_MAX = 300
+    CHANGE_WINDOW = 600
+
+    def __init__(self):
+        self.changes = deque()
+        self.idle = self.MIN
+
+    def record_change(self):
+        self.changes.append(time.time())
+        self.idle = self.MIN
+
+    def next_interval(self, state: dict, console_active: bool = False) -> float:
+        now = time.time()
+        while self.changes and self.changes[0] < now - self.CHANGE_WINDOW:
+            self.changes.popleft()
+        if console_active:
+            return self.MIN
+        if not state.get("building"):
+            interval, self.idle = self.idle, min(self.idle * 2, self.IDLE_MAX)
+            return interval
+        remaining = (state["timestamp"] + state["estimatedDuration"]) / 1000 - now
+        # Poll ~10 times over the rest of the estimate, more often the more changes we've seen lately.
+        interval = max(remaining, 0) / 10 / (1 + len(self.changes))
+        return min(max(interval, self.MIN), self.MAX)
+
+
+def loop(job: JenkinsJob, console: bool = False, history: bool = False, history_workers: int = 4):
     print(f"Started loop. Job:")
     pprint(job.pretty())
+    job_name = job.job_name
+    builds = fetch_builds(job_name)
+    if builds and builds[-1]["number"] > job.number:
+        print(f"Skipping ahead to newest build {builds[-1]['number']}...")
+        job = JenkinsJob.from_url(job_name, builds[-1]["number"])
+    db = history_db() if history else None
+    if db:
+        backfill_history(db, job_name, builds, history_workers)
+        print_duration_trend(db, job_name)
+    schedule = PollSchedule()
+    state = fetch_build_state(job_name, job.number)
+    console_offset = 0
     unchanged_iterations = 0
-    while job.nextBuild:
-        job = JenkinsJob.from_url(
-            "PR-" + str(job.pr_id).removeprefix("PR-"), job.nextBuild.number
-        )
-    last_job = job
     while True:
         print()
-        if job.nextBuild:
-            job = JenkinsJob.from_url(
-                "PR-" + str(job.pr_id).removeprefix("PR-"), job.nextBuild.number
-            )
-        else:
-            job = JenkinsJob.from_url(
-                "PR-" + str(job.pr_id).removeprefix("PR-"), job.number
-            )
-        if job == last_job:
-            print("Nothing changed.")
+        console_active = False
+        if console:
+            text, console_offset, console_active = fetch_console(job_name, job.number, console_offset)
+            if text:
+                print(text, end="" if text.endswith("\n") else "\n")
+        new_state = fetch_build_state(job_name, job.number)
+        if new_state.get("nextBuild"):
+            print(f"\x1b[1;95mNew build {new_state['nextBuild']['number']}!\x1b[0m")
+            job = JenkinsJob.from_url(job_name, new_state["nextBuild"]["number"])
+            state = fetch_build_state(job_name, job.number)
+            console_offset = 0
+            schedule.record_change()
+            pprint(job.pretty())
+            continue
+        if new_state == state:
+            if not console_active:
+                print("Nothing changed.")
             unchanged_iterations += 1
             if unchanged_iterations % 10 == 0:
                 pprint(job.pretty())
-            sleep(30)
+            sleep(schedule.next_interval(state, console_active))
             continue
-        diff = {
-            k: v
-            for k, v in job.__dict__.items()
-            if v != last_job.__dict__[k] and not k.startswith("_")
-        }
+        diff = {k: v for k, v in new_state.items() if v != state.get(k)}
         pprint(diff)
         unchanged_iterations = 0
-        last_job = job
+        state = new_state
+        if db and state.get("result"):
+            store_history(db, job_name, [state])
+            print_duration_trend(db, job_name)
+        schedule.record_change()
+        # Something moved: refresh the full job for commit/branch/causes.
+        job = JenkinsJob.from_url(job_name, job.number)
         print(f"\x1b[1;95mUpdate!\x1b[0m")
         pprint(job.pretty())
 
@@ -190,36 +431,150 @@ def loop(job: JenkinsJob):
         #     for attr in ['empty', 'fail_count', 'pass_count', 'skip_count']:
         #         print(f'\ttest_report.{attr}: {getattr(test_report, attr)}')
         #     print()
-        sleep(10)
+        sleep(schedule.next_interval(state, console_active))
 
 
-def remove_items_recursive(obj, condition):
-    if isinstance(obj, dict):
-        tmp = {}
-        for k in obj.keys():
-            if condition(k, obj[k]):
-                continue
-            tmp[k] = remove_items_recursive(obj[k], condition)
-        return tmp
+def job_name_from_arg(arg: str) -> str:
+    """`5456` or `PR-5456` -> `PR-5456`; anything else is taken as a job name."""
+    return "PR-" + arg.removeprefix("PR-") if arg.removeprefix("PR-").isdigit() else arg
+
+
+class RequestBudget:
+    """A global requests-per-second cap shared by every watcher, so many jobs don't hammer the master."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1 / per_second
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
 
-    elif isinstance(obj, list):
-        tmp = []
-        for v in obj:
-            if condition("", v):
-                continue
-            tmp.append(remove_items_recursive(v, condition))
-        return tmp
 
-    return obj
+async def afetch_json(client, budget: RequestBudget, url: str, tree: str) -> dict:
+    await budget.acquire()
+    response = await client.get(url, params={"tree": tree})
+    response.raise_for_status()
+    return response.json()
+
+
+async def watch_job(client, budget: RequestBudget, job_name: str, rows: dict, changed: asyncio.Event):
+    """Keep rows[job_name] up to date with the job's newest build, polling on a PollSchedule."""
+    schedule = PollSchedule()
+    row = rows[job_name] = {"number": None, "state": {}, "changed_at": None, "error": None}
+    while True:
+        try:
+            if row["number"] is None:
+                job = await afetch_json(client, budget, f"{JOBS_URL}/{job_name}/api/json", "lastBuild[number]")
+                row["number"] = (job.get("lastBuild") or {}).get("number")
+                if row["number"] is None:
+                    row["error"] = "no builds"
+                    changed.set()
+                    await asyncio.sleep(PollSchedule.IDLE_MAX)
+                    continue
+            state = await afetch_json(client, budget, f"{JOBS_URL}/{job_name}/{row['number']}/api/json", WATCH_TREE)
+            state.pop("_class", None)
+            row["error"] = None
+            if state.get("nextBuild"):
+                row["number"] = state["nextBuild"]["number"]
+                schedule.record_change()
+                continue
+            if state != row["state"]:
+                row["state"] = state
+                row["changed_at"] = time.time()
+                schedule.record_change()
+                changed.set()
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+            changed.set()
+        await asyncio.sleep(schedule.next_interval(row["state"]) if row["state"] else PollSchedule.MIN)
+
+
+def dashboard_table(rows: dict):
+    from rich.table import Table
+
+    table = Table(title=f"Jenkins — {datetime.now():%H:%M:%S}")
+    for column in ("job", "build", "status", "elapsed", "progress", "last change"):
+        table.add_column(column)
+    now = time.time()
+    for job_name, row in rows.items():
+        state = row["state"]
+        if row["error"] or not state:
+            table.add_row(job_name, str(row["number"] or "-"), row["error"] or "…", "", "", "")
+            continue
+        started = state["timestamp"] / 1000
+        elapsed = (now - started) if state["building"] else state["duration"] / 1000
+        estimated = state["estimatedDuration"] / 1000
+        status = "[yellow]building" if state["building"] else f"[{'green' if state['result'] == 'SUCCESS' else 'red'}]{state['result']}"
+        progress = f"{min(elapsed / estimated, 0.99):.0%}" if state["building"] and estimated > 0 else ""
+        last_change = f"{timedelta(seconds=int(now - row['changed_at']))} ago" if row["changed_at"] else ""
+        table.add_row(job_name, str(state["number"]), status, str(timedelta(seconds=int(elapsed))), progress, last_change)
+    return table
+
+
+async def watch_many(job_names: list[str], max_rps: float):
+    """Watch every job from one event loop, over one pooled session, in one live table.
+
+    Watchers only mark the table dirty; it is redrawn at most once a second however many
+    of them changed in between.
+    """
+    import httpx
+    from rich.live import Live
+
+    budget = RequestBudget(max_rps)
+    rows: dict = {}
+    changed = asyncio.Event()
+    async with httpx.AsyncClient(auth=(username, token), limits=httpx.Limits(max_connections=4), timeout=REQUEST_TIMEOUT) as client:
+        watchers = [asyncio.create_task(watch_job(client, budget, name, rows, changed)) for name in job_names]
+        try:
+            with Live(dashboard_table(rows), auto_refresh=False) as live:
+                while True:
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=1)
+                    except asyncio.TimeoutError:
+                        pass  # Redraw anyway: elapsed times and progress move on their own.
+                    changed.clear()
+                    live.update(dashboard_table(rows), refresh=True)
+                    await asyncio.sleep(1)
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
 
 
 def main():
     argparser = ArgumentParser()
     argparser.add_argument("--pr", required=False)
     argparser.add_argument("--job", required=False)
+    argparser.add_argument(
+        "-w",
+        "--watch",
+        nargs="+",
+        metavar="PR_OR_JOB",
+        help="Watch the latest build of several PRs/jobs at once in one live table",
+    )
+    argparser.add_argument(
+        "--max-rps",
+        type=float,
+        default=2,
+        help="Requests per second to the Jenkins master across all --watch jobs",
+    )
     argparser.add_argument("-u", "--username")
     argparser.add_argument("-t", "--token")
     argparser.add_argument("-b", "--build", type=int, default=1)
+    argparser.add_argument(
+        "-c", "--console", action="store_true", help="Stream the build's console output while watching"
+    )
+    argparser.add_argument(
+        "--history",
+        action="store_true",
+        help=f"Store build durations in {HISTORY_PATH}, backfilling older builds, and print the trend",
+    )
+    argparser.add_argument(
+        "--history-workers", type=int, default=4, help="Parallel requests when backfilling --history"
+    )
     ns = argparser.parse_args()
 
     _username = ns.username
@@ -248,14 +603,17 @@ def main():
     global token
     username = _username
     token = _token
+    if ns.watch:
+        asyncio.run(watch_many([job_name_from_arg(arg) for arg in ns.watch], ns.max_rps))
+        return
     if ns.pr:
         pr = "PR-" + str(ns.pr).removeprefix("PR-")
         job = JenkinsJob.from_url(pr, build)
     elif ns.job:
         job = JenkinsJob.from_url(ns.job, build)
     else:
-        raise ValueError("Either --pr or --job must be specified")
-    loop(job)
+        raise ValueError("Either --pr, --job or --watch must be specified")
+    loop(job, console=ns.console, history=ns.history, history_workers=ns.history_workers)
 
 
 if __name__ == "__main__":